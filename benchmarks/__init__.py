@@ -0,0 +1,24 @@
+"""
+Micro-benchmarks of the grid rendering pipeline.
+
+The benchmarks run in a Django project of their own, with an in-memory SQLite database and synthetic models - wide
+rows, foreign key chains and template-heavy columns (see ``grids``). Each stage of ``Grid.get_json_data`` is measured
+separately, for pages of different sizes:
+
+- ``build_query`` - ``_get_query_results``, which builds the queryset and applies the sort
+- ``count`` - ``_count_records``
+- ``page_query`` - retrieving the page's rows
+- ``render`` - converting the rows to dictionaries, and ``column:<name>`` for each column's ``render_cells``
+- ``encode`` - serializing the response with ``json_helpers.encode``
+- ``total`` - ``get_json_data`` and serialization, end to end
+- ``options`` - serializing the grid's options with ``json_helpers.dumps``, as the ``jqgrid`` template tag does
+
+For each stage the benchmark reports the time, rows per second, SQL queries and, when ``tracemalloc`` is available,
+memory allocations. Run it from the repository's root directory::
+
+    python -m benchmarks.run --rows 20 1000 100000 --output results.json
+
+and compare two runs with::
+
+    python -m benchmarks.compare before.json after.json --threshold 0.1
+"""
@@ -0,0 +1,45 @@
+"""
+Compares two benchmark runs, and reports the stages that got slower.
+
+Exits with status 1 if any stage is slower by more than the threshold, so that it can fail a CI job.
+"""
+import argparse
+import json
+import sys
+
+__author__ = 'zmbq'
+
+def load(filename):
+    with open(filename) as f:
+        results = json.load(f)['results']
+    return dict(((result['grid'], result['rows'], result['stage']), result) for result in results)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares two benchmark runs')
+    parser.add_argument('before', help='Results of the first run')
+    parser.add_argument('after', help='Results of the second run')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown that is reported as a regression (default: 0.1)')
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    regressions = 0
+    for key in sorted(set(before) & set(after), key=lambda key: (key[0], key[1] or 0, key[2])):
+        old, new = before[key], after[key]
+        ratio = new['seconds'] / old['seconds'] if old['seconds'] else 1.0
+        flags = []
+        if ratio > 1 + args.threshold:
+            flags.append('SLOWER')
+        if new['queries'] > old['queries']:
+            flags.append('MORE QUERIES')
+        if flags:
+            regressions += 1
+        print('%-16s %7s %-20s %10.3f ms -> %10.3f ms %6.2fx %s' % (
+            key[0], key[1] if key[1] is not None else '-', key[2], old['seconds'] * 1000, new['seconds'] * 1000,
+            ratio, ' '.join(flags)))
+
+    print('%d regressions' % regressions)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
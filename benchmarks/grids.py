@@ -0,0 +1,56 @@
+"""
+The grids the benchmarks measure.
+"""
+from djqgrid.grid import Grid
+from djqgrid.columns import TextColumn, TemplateColumn, LinkColumn, CheckboxColumn, KeyColumn
+from models import WideRow, Order
+
+__author__ = 'zmbq'
+
+class WideGrid(Grid):
+    """ Many simple text columns """
+    model = WideRow
+
+    id = KeyColumn('id')
+    name = TextColumn('Name', 'name')
+    code = TextColumn('Code', 'code')
+    description = TextColumn('Description', 'description')
+    email = TextColumn('Email', 'email')
+    city = TextColumn('City', 'city')
+    count = TextColumn('Count', 'count')
+    rank = TextColumn('Rank', 'rank')
+    weight = TextColumn('Weight', 'weight')
+    price = TextColumn('Price', 'price')
+    cost = TextColumn('Cost', 'cost')
+    created = TextColumn('Created', 'created')
+    updated = TextColumn('Updated', 'updated')
+    active = CheckboxColumn('Active', 'active')
+    archived = CheckboxColumn('Archived', 'archived')
+
+class WideValuesGrid(WideGrid):
+    """ The wide grid, retrieved with ``values`` """
+    values_projection = True
+
+class ChainGrid(Grid):
+    """ Columns that follow a chain of foreign keys """
+    model = Order
+
+    id = KeyColumn('id')
+    title = TextColumn('Title', 'title')
+    customer = TextColumn('Customer', 'customer.name')
+    city = TextColumn('City', 'customer.city.name')
+    country = TextColumn('Country', 'customer.city.country.name')
+
+class TemplateGrid(Grid):
+    """ Columns rendered by templates - simple ones, ones with tags, and links """
+    model = Order
+
+    id = KeyColumn('id')
+    title = TemplateColumn('Title', 'title', template='<b>{{ model.title }}</b>')
+    amount = TemplateColumn('Amount', 'amount', template='<span class="amount">{{ model.amount|floatformat:2 }}</span>')
+    status = TemplateColumn('Status', 'shipped',
+                            template='{% if model.shipped %}<i class="shipped">Shipped</i>{% else %}Pending{% endif %}')
+    customer = LinkColumn('Customer', 'customer.name', url_builder=lambda model: '/customers/%d' % model.customer_id)
+    shipped = CheckboxColumn('Shipped', 'shipped')
+
+grids = [WideGrid, WideValuesGrid, ChainGrid, TemplateGrid]
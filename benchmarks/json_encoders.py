@@ -0,0 +1,96 @@
+"""
+Compares the JSON encoders ``json_helpers`` can use, on representative grid payloads.
+
+Run it from the repository's root directory::
+
+    python benchmarks/json_encoders.py --rows 20 1000
+
+Encoders that aren't installed are skipped.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from djqgrid import json_helpers
+
+__author__ = 'zmbq'
+
+def make_rows(count, compact):
+    """
+    Builds the rows of a page of a text-heavy grid with a key column, five text columns, a checkbox column and a
+    link column.
+    """
+    rows = []
+    for i in range(count):
+        texts = [u'%d' % i, u'Customer %d' % i, u'North', u'%d.%02d' % (i * 7, i % 100), u'2014-06-%02d' % (i % 28 + 1),
+                 u'Some longer description of row %d' % i, True, u'Order %d' % i]
+        link = u'<a href="/orders/%d">Order %d</a>' % (i, i)
+        names = ['key', 'customer', 'region', 'amount', 'date', 'description', 'shipped', 'link']
+        if compact:
+            rows.append(texts + [{'html': {'link': link}}])
+        else:
+            html = dict(zip(names, texts))
+            html['link'] = link
+            row = dict(zip(names, texts))
+            row['html'] = html
+            rows.append(row)
+    return rows
+
+def make_options():
+    options = {'datatype': 'json', 'mtype': 'get', 'rowNum': 20, 'url': '/grid/query/1A2B3C',
+               'colNames': ['Key', 'Customer', 'Region', 'Amount', 'Date', 'Description', 'Shipped', 'Link'],
+               'colModel': [{'name': 'key', 'key': True, 'hidden': True}, {'name': 'customer'}, {'name': 'region'},
+                            {'name': 'amount'}, {'name': 'date'}, {'name': 'description'},
+                            {'name': 'shipped', 'formatter': 'checkbox'},
+                            {'name': 'link', 'formatter': json_helpers.function('customHtmlFormatter')}],
+               'loadComplete': json_helpers.function('loadCompleteHandler')}
+    return options
+
+def replace_dumps(o, **kwargs):
+    """ The previous implementation of ``json_helpers.dumps`` - serialize, and unquote the tokens with ``replace`` """
+    s = json.dumps(o, **kwargs)
+    s = s.replace('"' + json_helpers.token, '')
+    s = s.replace(json_helpers.token + '"', '')
+    return s
+
+def measure(func, repeat):
+    number = 1
+    while timeit.timeit(func, number=number) < 0.2:
+        number *= 2
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[20, 1000], help='Page sizes to measure')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of measurements, the best is reported')
+    args = parser.parse_args()
+
+    results = []
+    for name, load in json_helpers.encoders:
+        try:
+            json_helpers.set_encoder(name)
+        except ImportError:
+            print('%-10s not installed' % name)
+            continue
+        for count in args.rows:
+            for compact in (False, True):
+                payload = {'page': 1, 'total': 10, 'records': 10 * count, 'rows': make_rows(count, compact)}
+                seconds = measure(lambda: json_helpers.encode(payload), args.repeat)
+                size = len(json_helpers.encode(payload))
+                results.append((name, count, 'compact' if compact else 'dict', seconds, size))
+
+    print('%-10s %6s %-8s %12s %12s %10s' % ('encoder', 'rows', 'format', 'ms/page', 'rows/sec', 'bytes'))
+    for name, count, row_format, seconds, size in results:
+        print('%-10s %6d %-8s %12.3f %12.0f %10d' % (name, count, row_format, seconds * 1000, count / seconds, size))
+
+    options = make_options()
+    for label, func in (('replace', lambda: replace_dumps(options, indent=4)),
+                        ('single pass', lambda: json_helpers.dumps(options, indent=4))):
+        print('options dumps, %-12s %8.1f us' % (label, measure(func, args.repeat) * 1e6))
+
+if __name__ == '__main__':
+    main()
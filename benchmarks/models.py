@@ -0,0 +1,68 @@
+"""
+Synthetic models for the benchmarks.
+"""
+import datetime
+from decimal import Decimal
+from django.db import models
+
+__author__ = 'zmbq'
+
+class WideRow(models.Model):
+    """ A model with many fields of different types """
+    name = models.CharField(max_length=50)
+    code = models.CharField(max_length=20, db_index=True)
+    description = models.CharField(max_length=200)
+    email = models.CharField(max_length=100)
+    city = models.CharField(max_length=50)
+    count = models.IntegerField()
+    rank = models.IntegerField()
+    weight = models.FloatField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    cost = models.DecimalField(max_digits=10, decimal_places=2)
+    created = models.DateField()
+    updated = models.DateTimeField()
+    active = models.BooleanField(default=False)
+    archived = models.BooleanField(default=False)
+
+class Country(models.Model):
+    name = models.CharField(max_length=50)
+
+class City(models.Model):
+    name = models.CharField(max_length=50)
+    country = models.ForeignKey(Country)
+
+class Customer(models.Model):
+    name = models.CharField(max_length=50)
+    city = models.ForeignKey(City)
+
+class Order(models.Model):
+    """ The end of a foreign key chain - Order -> Customer -> City -> Country """
+    title = models.CharField(max_length=50)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    shipped = models.BooleanField(default=False)
+    customer = models.ForeignKey(Customer)
+
+def populate(rows, batch_size=1000):
+    """
+    Fills the database with ``rows`` wide rows and ``rows`` orders.
+    """
+    start = datetime.datetime(2014, 1, 1)
+    for first in range(0, rows, batch_size):
+        WideRow.objects.bulk_create([
+            WideRow(name=u'Row %d' % i, code=u'C%07d' % i, description=u'The description of row number %d' % i,
+                    email=u'user%d@example.com' % i, city=u'City %d' % (i % 100), count=i, rank=i % 1000,
+                    weight=i / 7.0, price=Decimal(i % 10000) / 100, cost=Decimal(i % 5000) / 100,
+                    created=(start + datetime.timedelta(days=i % 1000)).date(),
+                    updated=start + datetime.timedelta(seconds=i), active=i % 2 == 0, archived=i % 3 == 0)
+            for i in range(first, min(first + batch_size, rows))])
+
+    Country.objects.bulk_create([Country(id=i + 1, name=u'Country %d' % i) for i in range(10)])
+    City.objects.bulk_create([City(id=i + 1, name=u'City %d' % i, country_id=i % 10 + 1) for i in range(100)])
+    customers = max(rows // 100, 1)
+    Customer.objects.bulk_create([Customer(id=i + 1, name=u'Customer %d' % i, city_id=i % 100 + 1)
+                                  for i in range(customers)])
+    for first in range(0, rows, batch_size):
+        Order.objects.bulk_create([
+            Order(title=u'Order <%d>' % i, amount=Decimal(i % 10000) / 100, shipped=i % 2 == 0,
+                  customer_id=i % customers + 1)
+            for i in range(first, min(first + batch_size, rows))])
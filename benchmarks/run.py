@@ -0,0 +1,145 @@
+"""
+Runs the benchmarks, see the ``benchmarks`` package.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2, allocations are not measured
+    tracemalloc = None
+
+__author__ = 'zmbq'
+
+def measure(func, min_time, max_repeat):
+    """
+    Measures a function.
+
+    The function is called repeatedly, until it has run for ``min_time`` seconds or ``max_repeat`` times. The first
+    call also counts the SQL queries and the memory allocations.
+
+    Returns:
+        A dictionary with the best time of a call in ``seconds``, and the ``queries``, ``allocations`` and
+        ``allocated_bytes`` of a call. Allocations are ``None`` if ``tracemalloc`` is not available.
+    """
+    result = {'allocations': None, 'allocated_bytes': None}
+    if tracemalloc:
+        tracemalloc.start()
+        func()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = snapshot.statistics('filename')
+        result['allocations'] = sum(stat.count for stat in stats)
+        result['allocated_bytes'] = sum(stat.size for stat in stats)
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.time()
+        func()
+        best = time.time() - start
+    result['queries'] = len(queries.captured_queries)
+
+    total = best
+    repeat = 1
+    while total < min_time and repeat < max_repeat:
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = min(best, elapsed)
+        total += elapsed
+        repeat += 1
+    result['seconds'] = best
+    return result
+
+def benchmark_grid(gridcls, rows, min_time, max_repeat):
+    """
+    Measures the stages of ``get_json_data`` for a page of ``rows`` rows.
+
+    Returns:
+        A list of result dictionaries, one for each stage.
+    """
+    from djqgrid import json_helpers
+
+    grid = gridcls()
+    querydict = {'page': '1', 'rows': str(rows), 'sidx': grid.get_spec().column_list[1].name, 'sord': 'asc'}
+    stages = []
+
+    def add(stage, func):
+        result = measure(func, min_time, max_repeat)
+        result.update({'grid': gridcls.__name__, 'rows': rows, 'stage': stage,
+                       'rows_per_sec': rows / result['seconds'] if result['seconds'] else None})
+        stages.append(result)
+
+    queryset = grid._get_query_results(querydict)
+    projected, value_paths = grid._apply_projection(queryset)
+    models = list(grid._get_page(projected, 1, rows))
+    response = grid.get_json_data(querydict)
+
+    add('build_query', lambda: grid._get_query_results(querydict))
+    add('count', lambda: grid._count_records(queryset, querydict))
+    add('page_query', lambda: list(grid._get_page(grid._apply_projection(queryset)[0], 1, rows)))
+    add('render', lambda: list(grid._iter_rows([models], value_paths)))
+    if value_paths is None:
+        for column in grid.get_spec().column_list:
+            add('column:%s' % column.name, lambda column=column: column.render_cells(models))
+    add('encode', lambda: json_helpers.encode(response))
+    add('total', lambda: json_helpers.encode(grid.get_json_data(querydict)))
+    return stages
+
+def benchmark_options(gridcls, min_time, max_repeat):
+    from djqgrid import json_helpers
+
+    grid = gridcls()
+    result = measure(lambda: json_helpers.dumps(grid.get_options(), indent=4), min_time, max_repeat)
+    result.update({'grid': gridcls.__name__, 'rows': None, 'stage': 'options', 'rows_per_sec': None})
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the grid rendering pipeline')
+    parser.add_argument('--rows', type=int, nargs='+', default=[20, 1000, 100000], help='Page sizes to measure')
+    parser.add_argument('--grids', nargs='+', help='Names of the grids to measure (default: all of them)')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Minimal time to spend measuring each stage')
+    parser.add_argument('--max-repeat', type=int, default=100, help='Maximal number of times a stage is measured')
+    parser.add_argument('--output', help='Name of the JSON file the results are written to')
+    args = parser.parse_args()
+
+    call_command('syncdb', interactive=False, verbosity=0)
+    from benchmarks.models import populate
+    from benchmarks.grids import grids
+    from djqgrid import json_helpers
+
+    populate(max(args.rows))
+    if args.grids:
+        grids = [gridcls for gridcls in grids if gridcls.__name__ in args.grids]
+
+    results = []
+    for gridcls in grids:
+        results.append(benchmark_options(gridcls, args.min_time, args.max_repeat))
+        for rows in args.rows:
+            stages = benchmark_grid(gridcls, rows, args.min_time, args.max_repeat)
+            for stage in stages:
+                print('%-16s %7d %-20s %10.3f ms %12s rows/s %4d queries' % (
+                    stage['grid'], rows, stage['stage'], stage['seconds'] * 1000,
+                    '%.0f' % stage['rows_per_sec'] if stage['rows_per_sec'] else '-', stage['queries']))
+            results.extend(stages)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': {'python': platform.python_version(),
+                                       'django': django.get_version(),
+                                       'json_encoder': json_helpers.get_encoder(),
+                                       'date': datetime.datetime.utcnow().isoformat()},
+                       'results': results}, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
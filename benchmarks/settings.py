@@ -0,0 +1,10 @@
+"""
+Settings of the benchmark project.
+"""
+SECRET_KEY = 'djqgrid-benchmarks'
+DEBUG = False
+DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+INSTALLED_APPS = ['django.contrib.contenttypes', 'djqgrid', 'benchmarks']
+ROOT_URLCONF = 'benchmarks.urls'
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+USE_TZ = False
@@ -0,0 +1,214 @@
+"""
+This module audits the SQL queries grids run.
+
+A grid page should take a constant number of queries - a count and the page itself, plus one query for each prefetched
+relation. It's easy to break this without noticing: a ``LinkColumn`` whose ``url_builder`` touches a related object
+that isn't retrieved with the page, or a ``_get_additional_data`` that counts related objects, run a query for every
+row - the *N+1 queries* problem.
+
+Setting a grid's ``query_audit`` attribute captures the queries of ``get_json_data``::
+
+    class MyGrid(Grid):
+        model = MyModel
+        query_audit = QueryAudit(max_queries=3)
+
+The audit reports two problems:
+
+- Repeated queries - queries with the same *shape* (the same SQL, with different parameters) that run several times.
+  The report names the column, or ``_get_additional_data``, that ran them.
+- Exceeding the ``max_queries`` budget.
+
+Problems are logged as warnings, or raise a ``QueryAuditError`` if the audit is ``strict``, which fails tests. Tests can
+also audit a grid directly with ``audit_grid``.
+
+Auditing turns on Django's debug cursor while ``get_json_data`` runs, so it is meant for development and tests.
+Grids with a ``query_audit`` are never streamed (see ``Grid.is_streamed``), so all their responses are audited.
+"""
+import logging
+import re
+from contextlib import contextmanager
+from django.db import connections
+
+__author__ = 'zmbq'
+
+class QueryAuditError(AssertionError):
+    """
+    Raised by strict audits that find problems.
+    """
+    pass
+
+# Backends that can't interpolate the parameters (such as SQLite) record queries as "QUERY = '...' - PARAMS = (...)"
+_unformatted_re = re.compile(r'^QUERY = u?(?:\'(.*)\'|"(.*)") - PARAMS = ', re.DOTALL)
+_string_re = re.compile(r"'(?:[^']|'')*'")
+_number_re = re.compile(r'\b\d+(?:\.\d+)?\b')
+_list_re = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+def get_query_shape(sql):
+    """
+    Returns the shape of a query - its SQL with the literal values replaced by ``?`` (or its SQL before the parameters
+    were interpolated), so that the same query with different parameters has the same shape.
+    """
+    match = _unformatted_re.match(sql)
+    if match:
+        return match.group(1) or match.group(2)
+    shape = _string_re.sub('?', sql)
+    shape = _number_re.sub('?', shape)
+    return _list_re.sub('(...)', shape)
+
+class QueryRecorder(object):
+    """
+    Records the queries run on a connection, and the source of each query.
+    """
+    def __init__(self, connection):
+        self._connection = connection
+        self._use_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True  # Queries are only recorded by the debug cursor
+        self._start = len(connection.queries)
+        self._sources = []  # (source, first query, end query) of each block of queries
+        self.queries = None
+
+    @contextmanager
+    def source(self, name):
+        """
+        A context manager that attributes the queries of its block to a source.
+        """
+        start = len(self._connection.queries)
+        try:
+            yield
+        finally:
+            self._sources.append((name, start, len(self._connection.queries)))
+
+    def stop(self):
+        """
+        Stops recording, and fills ``queries`` with a list of ``(sql, source)`` tuples. Queries without a source have
+        a source of ``None``.
+        """
+        queries = self._connection.queries[self._start:]
+        sources = [None] * len(queries)
+        for name, start, end in self._sources:
+            for i in range(start - self._start, end - self._start):
+                sources[i] = name
+        self.queries = [(query['sql'], source) for query, source in zip(queries, sources)]
+        self._connection.use_debug_cursor = self._use_debug_cursor
+
+class AuditReport(object):
+    """
+    The result of an audit.
+
+    Attributes:
+        grid_name: The name of the grid's class
+        queries: The queries the grid ran, as a list of ``(sql, source)`` tuples
+        repeated: The repeated queries, as a list of ``(shape, count, sources)`` tuples
+        max_queries: The query budget, or ``None``
+    """
+    def __init__(self, grid_name, queries, max_queries=None, min_repeats=2):
+        self.grid_name = grid_name
+        self.queries = queries
+        self.max_queries = max_queries
+
+        shapes = {}
+        order = []
+        for sql, source in queries:
+            shape = get_query_shape(sql)
+            if shape not in shapes:
+                shapes[shape] = [0, set()]
+                order.append(shape)
+            shapes[shape][0] += 1
+            shapes[shape][1].add(source or 'grid')
+        self.repeated = [(repeated, shapes[repeated][0], sorted(shapes[repeated][1]))
+                         for repeated in order if shapes[repeated][0] >= min_repeats]
+
+    @property
+    def exceeded(self):
+        """ True if the grid ran more queries than its budget """
+        return self.max_queries is not None and len(self.queries) > self.max_queries
+
+    @property
+    def ok(self):
+        """ True if no problems were found """
+        return not self.repeated and not self.exceeded
+
+    def __str__(self):
+        lines = ['%s ran %d queries%s' % (self.grid_name, len(self.queries),
+                                         ' (budget: %d)' % self.max_queries if self.max_queries is not None else '')]
+        for shape, count, sources in self.repeated:
+            lines.append('  %d times from %s: %s' % (count, ', '.join(sources), shape))
+        return '\n'.join(lines)
+
+class QueryAudit(object):
+    """
+    Audits the queries of a grid's ``get_json_data``.
+    """
+    def __init__(self, max_queries=None, strict=False, min_repeats=2, logger='djqgrid.auditing'):
+        """
+        Initializes a QueryAudit
+
+        Args:
+            max_queries: The maximal number of queries ``get_json_data`` may run, or ``None`` for no budget
+            strict: If True, problems raise a ``QueryAuditError``. Otherwise they are logged as warnings.
+            min_repeats: Queries with the same shape that run at least this many times are reported
+            logger: The name of the logger problems are logged to
+        """
+        self.max_queries = max_queries
+        self._strict = strict
+        self._min_repeats = min_repeats
+        self._logger = logging.getLogger(logger)
+
+    def start(self, grid):
+        """
+        Starts recording the queries of a grid.
+
+        Returns:
+            A ``QueryRecorder``
+        """
+        return QueryRecorder(connections[grid.model.objects.db])
+
+    def finish(self, grid, recorder):
+        """
+        Reports the problems found in the queries of a stopped recorder.
+
+        Returns:
+            The ``AuditReport``
+        Raises:
+            QueryAuditError if the audit is strict and problems were found
+        """
+        report = AuditReport(grid.__class__.__name__, recorder.queries, self.max_queries, self._min_repeats)
+        self._report(report)
+        return report
+
+    def _report(self, report):
+        if not report.ok:
+            if self._strict:
+                raise QueryAuditError(str(report))
+            self._logger.warning('%s', report)
+
+class _CollectingAudit(QueryAudit):
+    """ An audit that keeps its reports instead of reporting them, used by ``audit_grid`` """
+    def __init__(self, *args, **kwargs):
+        super(_CollectingAudit, self).__init__(*args, **kwargs)
+        self.reports = []
+
+    def _report(self, report):
+        self.reports.append(report)
+
+def audit_grid(grid, querydict, max_queries=None, min_repeats=2):
+    """
+    Audits a grid's ``get_json_data``, regardless of its ``query_audit``. This is meant for tests::
+
+        report = audit_grid(MyGrid(), {'page': '1', 'rows': '20'}, max_queries=3)
+        self.assertTrue(report.ok, str(report))
+
+    Returns:
+        The ``AuditReport``
+    """
+    audit = _CollectingAudit(max_queries=max_queries, min_repeats=min_repeats)
+    saved = grid.__dict__.get('query_audit')
+    grid.query_audit = audit  # Shadows the class's query_audit
+    try:
+        grid.get_json_data(querydict)
+    finally:
+        if saved is None:
+            del grid.query_audit
+        else:
+            grid.query_audit = saved
+    return audit.reports[0]
@@ -0,0 +1,173 @@
+"""
+This module implements the grid response cache.
+
+Many users often open the same read-mostly grids. Instead of querying, rendering and serializing the same page over
+and over again, a grid can cache its responses by setting its ``response_cache`` attribute to a ``ResponseCache``::
+
+    class MyGrid(Grid):
+        model = MyModel
+        response_cache = ResponseCache(timeout=300)
+
+Responses are cached in one of Django's cache backends, under a key made of the grid's ID and the request's query
+parameters (see ``Grid.get_request_key``).
+
+Cached responses are invalidated automatically when the grid's data changes. Each model has a *version* that is stored
+in the cache, and the versions of all the models a grid depends on (see ``Grid.get_dependent_models``) are part of the
+grid's cache keys. Whenever a model instance is saved or deleted, or a many-to-many relation is changed, the versions of
+the models involved are incremented, and the grids' cache keys change with them. Since the versions are stored in the
+cache, this works across processes, as long as the cache backend itself is shared.
+"""
+import hashlib
+import time
+from django.core.cache import get_cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+__author__ = 'zmbq'
+
+# Grids registered with a ResponseCache whose dependent models haven't been resolved yet. Models can't be inspected
+# when the grid classes are created, so this is done when the first signal arrives.
+_pending = []
+
+# Maps each model to the ResponseCaches of the grids that depend on it
+_watched = {}
+
+def _resolve_pending():
+    while _pending:
+        cache, gridcls = _pending.pop()
+        for model in gridcls.get_dependent_models():
+            _watched.setdefault(model, set()).add(cache)
+
+def _invalidate(*models):
+    _resolve_pending()
+    for model in models:
+        for cache in _watched.get(model, ()):
+            cache.invalidate(model)
+
+def _model_changed(sender, **kwargs):
+    _invalidate(sender)
+
+def _m2m_changed(sender, instance, action, model, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidate(type(instance), model)
+
+post_save.connect(_model_changed, dispatch_uid='djqgrid.caching.post_save')
+post_delete.connect(_model_changed, dispatch_uid='djqgrid.caching.post_delete')
+m2m_changed.connect(_m2m_changed, dispatch_uid='djqgrid.caching.m2m_changed')
+
+class ResponseCache(object):
+    """
+    Caches the serialized responses of a grid.
+
+    Attributes:
+        hits: Number of requests this process served from the cache
+        misses: Number of requests this process could not serve from the cache
+    """
+    def __init__(self, timeout=60, cache_alias='default', key_prefix='djqgrid-response'):
+        """
+        Initializes a ResponseCache
+
+        Args:
+            timeout: Number of seconds responses are cached for
+            cache_alias: The Django cache the responses are stored in
+            key_prefix: Prefix of the cache keys
+        """
+        self._timeout = timeout
+        self._cache_alias = cache_alias
+        self._key_prefix = key_prefix
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, gridcls):
+        """
+        Registers a grid class with the cache, so that its responses are invalidated when its models change.
+
+        This is called automatically for grid classes that have a ``response_cache``.
+        """
+        _pending.append((self, gridcls))
+
+    @property
+    def cache(self):
+        return get_cache(self._cache_alias)
+
+    def _get_version_key(self, model):
+        return '%s:version:%s' % (self._key_prefix, model._meta.db_table)
+
+    def get_versions(self, models):
+        """
+        Returns the versions of models, as a list sorted like the models' table names.
+        """
+        keys = sorted(self._get_version_key(model) for model in models)
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # Start from the current time, and not from 0 - if the version has been evicted from the cache,
+                # starting from 0 may lead to keys of old responses.
+                self.cache.add(key, int(time.time() * 1000), None)
+                versions[key] = self.cache.get(key)
+        return [versions[key] for key in keys]
+
+    def invalidate(self, model):
+        """
+        Invalidates the cached responses of all the grids that depend on a model.
+        """
+        key = self._get_version_key(model)
+        try:
+            self.cache.incr(key)
+        except ValueError:  # The version is not in the cache
+            self.cache.add(key, int(time.time() * 1000), None)
+
+    def get_key(self, grid, querydict):
+        """
+        Returns the cache key of a grid's response to a request.
+
+        Args:
+            grid: The grid
+            querydict: The request's query dictionary
+        """
+        versions = self.get_versions(grid.get_dependent_models())
+        key = '%s|%s' % (grid.get_request_key(querydict), versions)
+        return '%s:%s' % (self._key_prefix, hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    def _get_total_key(self, key):
+        return key + ':total'
+
+    def get(self, key):
+        """
+        Returns a cached response as a ``(content, total)`` tuple, or ``None`` if the response is not in the cache.
+        """
+        total_key = self._get_total_key(key)
+        cached = self.cache.get_many([key, total_key])
+        if key not in cached or total_key not in cached:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached[key], cached[total_key]
+
+    def set(self, key, content, total):
+        """
+        Caches a response.
+
+        Args:
+            key: The response's cache key (see ``get_key``)
+            content: The serialized response
+            total: The number of pages in the response. It is stored separately, so that it can be read without
+                parsing the response, and so that ``contains`` can check for the response without retrieving it.
+        """
+        self.cache.set_many({key: content, self._get_total_key(key): total}, self._timeout)
+
+    def contains(self, key):
+        """
+        Returns True if a response is cached. Only the response's ``total`` is retrieved from the cache, and the
+        ``hits`` and ``misses`` are not counted.
+        """
+        return self.cache.get(self._get_total_key(key)) is not None
+
+    @property
+    def stats(self):
+        """
+        Returns a dictionary with this process's ``hits``, ``misses`` and hit ``ratio``, to help tune the timeout.
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'ratio': float(self.hits) / total if total else 0.0}
@@ -1,7 +1,32 @@
-import string
+import copy
+import operator
 from django.template import Context, Template
 from django.template.loader import get_template
+from django.utils import six
+import filtering
 from json_helpers import function
+from template_compiler import compile_template, flatten, render_value
+
+# Compiled accessors of model paths, see _get_accessor
+_accessors = {}
+
+def _get_accessor(path):
+    """
+    Returns a function that takes a model and returns the attribute at ``path`` (``innerobj.attr``).
+
+    The accessors are compiled once per path.
+    """
+    accessor = _accessors.get(path)
+    if accessor is None:
+        accessor = _accessors[path] = operator.attrgetter(path)
+    return accessor
+
+def _is_overridden(obj, base, name):
+    """
+    Returns True if ``obj``'s class overrides the method ``name`` of ``base``.
+    """
+    method = six.get_unbound_function(getattr(type(obj), name))
+    return method is not six.get_unbound_function(getattr(base, name))
 
 class Column(object):
     """
@@ -27,40 +52,89 @@ class Column(object):
                 in the ``fullname`` attribute of the ``Person`` model, ``model_path`` should be ``fullname``.
                 ``model_path`` can also access attributes in nested objects: ``innerobj.attr`` will be resolved to
                 ``model_instance.innerobj.attr``
+            search_operators: The jqGrid search operators the column accepts (see the ``filtering`` module). The
+                default is all the operators, or the ones that can use an index if ``search_index`` is set.
+            search_index: The lookup of prefix searches that can use an index on the column's field - ``'startswith'``
+                for a regular index (on PostgreSQL, it should be created with ``varchar_pattern_ops``), or
+                ``'istartswith'`` for an index on the field's uppercase value. If set, the column only accepts search
+                operators that can use an index.
             **kwargs: All other arguments are copied as is to the column's ``colModel``.
         """
         self._title = title
+        self._name = title.lower()
+        self._search_operators = kwargs.pop('search_operators', None)
+        self._search_index = kwargs.pop('search_index', None)
         self._colModel = dict(kwargs)
-        self._colModel['name'] = title.lower()
+        self._colModel['name'] = self._name
+        if self._search_operators is not None or self._search_index:
+            # Let jqGrid only offer the accepted operators
+            searchoptions = dict(self._colModel.get('searchoptions') or {})
+            searchoptions.setdefault('sopt', list(self.get_search_operators()))
+            self._colModel['searchoptions'] = searchoptions
         self._count = Column._creation_count
         Column._creation_count += 1
         self._model_path = model_path
+        self._compile()
+
+    def _compile(self):
+        """
+        Prepares everything the column needs for rendering cells, so that it's done once and not for every cell.
+        """
+        self._accessor = _get_accessor(self._model_path)
+        self._custom_attr = _is_overridden(self, Column, '_get_model_attr')
+        # When the value's HTML is its text, render_cell renders the value once. When the value is retrieved
+        # and formatted by the default methods, render_cell skips them and uses the accessor directly.
+        self._html_is_text = not _is_overridden(self, Column, 'render_html')
+        self._plain_text = not (_is_overridden(self, Column, 'render_text') or
+                                _is_overridden(self, Column, '_get_model_value') or
+                                self._custom_attr)
+        self._uses_prepared = _is_overridden(self, Column, 'render_from_prepared')
+
+    def __deepcopy__(self, memo):
+        # Accessors can't be copied, so they are compiled again
+        result = self.__class__.__new__(self.__class__)
+        memo[id(self)] = result
+        state = dict(self.__dict__)
+        del state['_accessor']
+        result.__dict__.update(copy.deepcopy(state, memo))
+        result._compile()
+        return result
 
     def _get_model_attr(self, attr, model):
         """
         Returns model.attr, taking into account nested attributes.
         """
-        return reduce(getattr, attr.split('.'), model)
+        return _get_accessor(attr)(model)
 
     def _get_model_value(self, model):
         """
         Returns the column's value in the model
 
-        The default implementation is to use ``get_model_attr``
+        The default implementation is to use the ``model_path`` accessor compiled when the column was created, or
+        ``_get_model_attr`` if it's overridden.
         """
-        return self._get_model_attr(self._model_path, model)
+        if self._custom_attr:
+            return self._get_model_attr(self._model_path, model)
+        return self._accessor(model)
 
-    def render_text(self, model):
+    def render_value(self, value):
         """
-        Returns a text representation of the column's value.
+        Returns a text representation of a value of the column.
 
-        The default implementation is to convert ``get_model_value`` to a unicode string.
+        The default implementation is to convert the value to a unicode string.
         """
-        value = self._get_model_value(model)
         if value is None:
             return unicode('')
         return unicode(value)
 
+    def render_text(self, model):
+        """
+        Returns a text representation of the column's value.
+
+        The default implementation is to pass ``get_model_value`` to ``render_value``.
+        """
+        return self.render_value(self._get_model_value(model))
+
     def render_html(self, model):
         """
         Returns an HTML representation of the column's value.
@@ -69,16 +143,114 @@ class Column(object):
         """
         return self.render_text(model)
 
+    def render_cell(self, model):
+        """
+        Returns both the text and the HTML representations of the column's value.
+
+        This is what grids call to render a cell. It returns the same values as ``render_text`` and ``render_html``,
+        but when the HTML is the text (``render_html`` is not overridden), the value is retrieved and rendered once.
+
+        Returns:
+            A ``(text, html)`` tuple.
+        """
+        if self._uses_prepared:
+            return self.render_from_prepared(model, self.prepare([model]))
+        text = self._render_text(model)
+        if self._html_is_text:
+            return text, text
+        return text, self.render_html(model)
+
+    def render_cells(self, models):
+        """
+        Renders the column's cells for a page of models.
+
+        The default implementation calls ``render_cell`` for each model, or ``prepare`` once and
+        ``render_from_prepared`` for each model, if ``render_from_prepared`` is overridden. Columns that can share work
+        between cells override this.
+
+        Returns:
+            A list of ``(text, html)`` tuples, one for each model.
+        """
+        if self._uses_prepared:
+            prepared = self.prepare(models)
+            return [self.render_from_prepared(model, prepared) for model in models]
+        return [self.render_cell(model) for model in models]
+
+    def prepare(self, models):
+        """
+        Prepares the data needed to render a page of models, before its cells are rendered.
+
+        Columns whose values come from other tables override this and ``render_from_prepared``, so that a single
+        query retrieves the values of the entire page, instead of a query for each row. For example::
+
+            class StatusColumn(Column):
+                def prepare(self, models):
+                    return dict(Status.objects.filter(order__in=models).values_list('order_id', 'name'))
+
+                def render_from_prepared(self, model, prepared):
+                    text = prepared.get(model.pk, '')
+                    return text, text
+
+        The default implementation returns ``None``.
+
+        Args:
+            models: The models of the page's rows
+        Returns:
+            An object that is passed to ``render_from_prepared`` with each model
+        """
+        return None
+
+    def render_from_prepared(self, model, prepared):
+        """
+        Renders a cell from the data returned by ``prepare``. When this is overridden, ``render_cell`` and
+        ``render_cells`` call it instead of ``render_text`` and ``render_html``.
+
+        The default implementation ignores ``prepared`` and returns ``render_cell(model)``.
+
+        Returns:
+            A ``(text, html)`` tuple.
+        """
+        return self.render_cell(model)
+
+    def render_texts(self, models):
+        """
+        Renders the text of the column's cells for a page of models.
+
+        Returns:
+            A list with the text of each model.
+        """
+        if self._uses_prepared:
+            return [text for text, html in self.render_cells(models)]
+        return [self._render_text(model) for model in models]
+
+    def _render_text(self, model):
+        """
+        Returns ``render_text(model)``, skipping ``render_text`` and ``_get_model_value`` if they're not overridden.
+        """
+        if self._plain_text:
+            return self.render_value(self._accessor(model))
+        return self.render_text(model)
+
     @property
     def title(self):
         """ Returns the name that goes in the colName JSON """
         return self._title
 
+    @property
+    def name(self):
+        """ Returns the column's name - its lowercase title, used in the colModel and in the grid's rows """
+        return self._name
+
     @property
     def model(self):
         """ Returns the ``colModel`` """
         return self._colModel
 
+    @property
+    def model_path(self):
+        """ Returns the column's model path """
+        return self._model_path
+
     def get_sort_name(self):
         """
         Returns the column's "sort-name", which is used to apply ordering on a queryset.
@@ -87,6 +259,38 @@ class Column(object):
         """
         return self._model_path.replace('.', '__')
 
+    @property
+    def search_index(self):
+        """ Returns the lookup of prefix searches that can use an index, or ``None`` """
+        return self._search_index
+
+    def get_search_operators(self):
+        """
+        Returns the jqGrid search operators the column accepts.
+
+        Columns with ``search: False`` in their ``colModel`` accept no operators.
+        """
+        if self._colModel.get('search') is False:
+            return ()
+        if self._search_operators is not None:
+            return tuple(self._search_operators)
+        return filtering.INDEXED_OPERATORS if self._search_index else filtering.OPERATORS
+
+    def get_value_path(self):
+        """
+        Returns the path of the column's value in query form (``a__b``), for grids that render rows from values
+        instead of model instances.
+
+        Returns ``None`` if the column must be rendered from a model instance. This is the case for columns that
+        override ``_get_model_attr``, ``_get_model_value``, ``render_text``, ``render_html`` or
+        ``render_from_prepared`` - such columns should override ``render_value`` instead if they only change the
+        value's formatting.
+        """
+        for name in ('_get_model_attr', '_get_model_value', 'render_text', 'render_html', 'render_from_prepared'):
+            if _is_overridden(self, Column, name):
+                return None
+        return self._model_path.replace('.', '__')
+
 class TextColumn(Column):
     """
     A column that contains simple text strings.
@@ -107,6 +311,12 @@ class ClientOnlyColumn(Column):
     def _get_model_value(self, model):
         return ''
 
+    def get_value_path(self):
+        return ''   # No value is retrieved from the database
+
+    def get_search_operators(self):
+        return ()   # There's nothing to search in the database
+
 class TemplateColumn(Column):
     """
     A column that is rendered by a Django template
@@ -135,16 +345,32 @@ class TemplateColumn(Column):
         """
         super(TemplateColumn, self).__init__(title, model_path, **kwargs)
         if template:
-            self._template = Template(template.strip())
+            self._set_template(Template(template.strip()), template)
         elif template_name:
-            self._template = get_template(template_name)
+            self._set_template(get_template(template_name))
         else:
-            self._template = None # set_template may be called later
+            self._set_template(None) # set_template may be called later
         if not 'formatter' in kwargs:
             self._colModel['formatter'] = function('customHtmlFormatter')
 
+    def _compile(self):
+        super(TemplateColumn, self)._compile()
+        self._custom_html = _is_overridden(self, TemplateColumn, 'render_html')
+
+    def _set_template(self, template, source=None):
+        """
+        Sets the column's template, and compiles it if it's simple (see the ``template_compiler`` module).
+
+        Args:
+            template: The Django template, or None
+            source: The template's source, if it was given as a string
+        """
+        self._template = template
+        self._template_source = source
+        self._compiled_template = compile_template(template) if template else None
+
     def set_template(self, template):
-        self._template = Template(template.strip())
+        self._set_template(Template(template.strip()), template)
 
     def _fill_context(self, context, model):
         """
@@ -165,16 +391,42 @@ class TemplateColumn(Column):
     def render_html(self, model):
         if not self._template:
             raise ValueError("Template has not been set in %s" % self)
-        context = Context({'model': model})
-        self._fill_context(context, model)
-        html = self._template.render(context = context)
+        return self._render_html(model, Context())
 
-        # jqGrid has issues with multiline cell values, so we make sure the cell value fits in a single line.
-        lines = html.split('\n')
-        lines = [line.strip() for line in lines]
-        html = string.join(lines)
+    def render_html_batch(self, models):
+        """
+        Renders the HTML of a page of models.
 
-        return html
+        A single template context is used for all the models - each model's data is pushed into the context before
+        its HTML is rendered, and popped afterwards.
+
+        Returns:
+            A list with the HTML of each model.
+        """
+        if not self._template:
+            raise ValueError("Template has not been set in %s" % self)
+        context = Context()
+        return [self._render_html(model, context) for model in models]
+
+    def render_cells(self, models):
+        if self._custom_html or self._uses_prepared:
+            return super(TemplateColumn, self).render_cells(models)
+        return zip([self._render_text(model) for model in models], self.render_html_batch(models))
+
+    def _render_html(self, model, context):
+        """
+        Renders the HTML of a model in a context. The model's data is pushed into the context, and popped when done.
+        """
+        context.update({'model': model})
+        try:
+            self._fill_context(context, model)
+            if self._compiled_template:
+                return self._compiled_template.render(context)
+
+            # jqGrid has issues with multiline cell values, so we make sure the cell value fits in a single line.
+            return flatten(self._template.render(context = context))
+        finally:
+            context.pop()
 
 class LinkColumn(TemplateColumn):
     """
@@ -198,11 +450,33 @@ class LinkColumn(TemplateColumn):
         self._url_builder = url_builder
         # TODO: Allow url_builder to be a model_path or a function.
 
+    def _compile(self):
+        super(LinkColumn, self)._compile()
+        self._custom_context = _is_overridden(self, LinkColumn, '_fill_context')
+
     def _fill_context(self, context, model):
         url = self._url_builder(model)
         context['url'] = url
         context['name'] = self._get_model_attr(self._model_path, model)
 
+    def _render_html(self, model, context):
+        # Unless the template or the context have been customized, the link is rendered without the template
+        if self._custom_context or self._template_source != LinkColumn.template:
+            return super(LinkColumn, self)._render_html(model, context)
+
+        url = self._url_builder(model)
+        name = self._get_model_attr(self._model_path, model)
+        if callable(url) or callable(name):
+            # The template calls callables, leave this to the template
+            context.update({'model': model, 'url': url, 'name': name})
+            try:
+                return self._compiled_template.render(context)
+            finally:
+                context.pop()
+
+        html = u'<a href="%s">%s</a>' % (render_value(url, context), render_value(name, context))
+        return flatten(html) if '\n' in html else html
+
 class CheckboxColumn(Column):
     """
     A column that is rendered as a checkbox.
@@ -215,8 +489,8 @@ class CheckboxColumn(Column):
             kwargs['editoptions'] = {'value': 'true:false'}
         super(CheckboxColumn, self).__init__(title, model_path, **kwargs)
 
-    def render_text(self, model):
-        text = super(CheckboxColumn, self).render_text(model)
+    def render_value(self, value):
+        text = super(CheckboxColumn, self).render_value(value)
         return text=='True'    # Turn the field into a boolean, for JavaScript
 
 class KeyColumn(Column):
@@ -229,3 +503,101 @@ class KeyColumn(Column):
         kwargs['key'] = True
         kwargs['hidden'] = True
         super(KeyColumn, self).__init__("Key", model_path, **kwargs)
+
+class AnnotatedColumn(Column):
+    """
+    A column whose value is computed by the database - the grid annotates its queryset with the value (see
+    ``Grid._apply_annotations``), and the column reads it from the annotated models.
+
+    The value is retrieved with the page, in the same query, instead of a query for each row. The column can be sorted
+    by the value. Annotated columns can't be searched, since searches are applied before the annotations.
+
+    AnnotatedColumn is an abstract class - use ``AggregateColumn`` or ``ExpressionColumn``.
+    """
+    def __init__(self, title, alias, **kwargs):
+        """
+        Initializes an AnnotatedColumn
+
+        Args:
+            title: The column's title
+            alias: The name of the annotation. It must not be the name of one of the model's fields.
+            **kwargs: Additional arguments that will be passed directly to the column's ``colModel``
+        """
+        kwargs.setdefault('search', False)
+        super(AnnotatedColumn, self).__init__(title, alias, **kwargs)
+
+    @property
+    def alias(self):
+        """ Returns the name of the column's annotation """
+        return self._model_path
+
+    def annotate(self, queryset):
+        """
+        Returns the queryset annotated with the column's value.
+        """
+        raise NotImplementedError()
+
+    def get_lookup_paths(self):
+        """
+        Returns the query paths the annotation goes through (``orders__amount``), so that the grid's cached responses
+        are invalidated when the related models change. The default is no paths.
+        """
+        return ()
+
+class AggregateColumn(AnnotatedColumn):
+    """
+    A column that contains an aggregate over related rows, such as the number of a customer's orders::
+
+        orders = AggregateColumn('Orders', 'order_count', Count('orders'))
+        invoiced = AggregateColumn('Invoiced', 'total_invoiced', Sum('orders__amount'))
+    """
+    def __init__(self, title, alias, aggregate, **kwargs):
+        """
+        Initializes an AggregateColumn
+
+        Args:
+            title: The column's title
+            alias: The name of the annotation. It must not be the name of one of the model's fields.
+            aggregate: A Django aggregate, such as ``Count('orders')``
+            **kwargs: Additional arguments that will be passed directly to the column's ``colModel``
+        """
+        super(AggregateColumn, self).__init__(title, alias, **kwargs)
+        self._aggregate = aggregate
+
+    def annotate(self, queryset):
+        return queryset.annotate(**{self.alias: self._aggregate})
+
+    def get_lookup_paths(self):
+        return (self._aggregate.lookup,)
+
+class ExpressionColumn(AnnotatedColumn):
+    """
+    A column that contains the value of an SQL expression, added to the query with ``QuerySet.extra``::
+
+        margin = ExpressionColumn('Margin', 'margin', '"shop_order"."price" - "shop_order"."cost"')
+
+    Django 1.6 can only annotate querysets with aggregates, so other expressions (arithmetic on fields, correlated
+    subqueries) are written in SQL.
+    """
+    def __init__(self, title, alias, sql, params=(), lookup_paths=(), **kwargs):
+        """
+        Initializes an ExpressionColumn
+
+        Args:
+            title: The column's title
+            alias: The name of the expression's value. It must not be the name of one of the model's fields.
+            sql: The SQL expression
+            params: The parameters of the SQL expression
+            lookup_paths: The query paths of the related models the expression reads, see ``get_lookup_paths``
+            **kwargs: Additional arguments that will be passed directly to the column's ``colModel``
+        """
+        super(ExpressionColumn, self).__init__(title, alias, **kwargs)
+        self._sql = sql
+        self._params = tuple(params)
+        self._lookup_paths = tuple(lookup_paths)
+
+    def annotate(self, queryset):
+        return queryset.extra(select={self.alias: self._sql}, select_params=self._params)
+
+    def get_lookup_paths(self):
+        return self._lookup_paths
@@ -0,0 +1,212 @@
+"""
+This module compresses grid responses.
+
+Large pages, and grids without a pager, produce large JSON responses that compress very well. Sites that can't enable
+Django's ``GZipMiddleware`` can compress the responses of specific grids by setting their ``compression`` attribute::
+
+    class MyGrid(Grid):
+        model = MyModel
+        compression = ResponseCompression(level=6, min_size=1024)
+
+The encoding is negotiated from the request's ``Accept-Encoding`` header. ``gzip`` and ``deflate`` are supported out
+of the box, other encodings can be added with ``register_encoding``. Responses smaller than ``min_size`` bytes are not
+compressed, since compressing them saves little and costs CPU time.
+
+Streamed responses are compressed as they are streamed. Since the headers are sent before the content, the beginning
+of the stream is read in advance, until it reaches ``min_size`` bytes or ends, to decide whether to compress.
+"""
+import itertools
+import re
+import zlib
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+__author__ = 'zmbq'
+
+class ZlibCompressor(object):
+    """
+    Compresses data with ``zlib``.
+
+    Args:
+        level: The compression level, 1 (fastest) to 9 (smallest)
+        wbits: The ``zlib`` window bits, which also select the format - ``16 + zlib.MAX_WBITS`` for ``gzip``,
+            ``zlib.MAX_WBITS`` for ``deflate``
+    """
+    def __init__(self, level, wbits):
+        self._compressobj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data):
+        """ Compresses a chunk of data, returning the compressed data that is ready """
+        return self._compressobj.compress(data)
+
+    def flush(self):
+        """ Returns all the compressed data of the chunks so far, so that the client can decompress them """
+        return self._compressobj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        """ Returns the rest of the compressed data, ending the compressed stream """
+        return self._compressobj.flush()
+
+# Maps each encoding to a function that takes a compression level and returns a compressor
+_encodings = {
+    'gzip': lambda level: ZlibCompressor(level, 16 + zlib.MAX_WBITS),
+    'deflate': lambda level: ZlibCompressor(level, zlib.MAX_WBITS),
+}
+
+def register_encoding(name, compressor_factory):
+    """
+    Registers a content encoding.
+
+    Args:
+        name: The encoding's name in ``Accept-Encoding`` and ``Content-Encoding`` (such as ``br``)
+        compressor_factory: A function that takes a compression level and returns an object with the methods of
+            ``ZlibCompressor``
+    """
+    _encodings[name] = compressor_factory
+
+def parse_accept_encoding(header):
+    """
+    Parses an ``Accept-Encoding`` header.
+
+    Returns:
+        A dictionary mapping each encoding (and ``*``) to its quality value
+    """
+    qualities = {}
+    for item in header.split(','):
+        parts = item.strip().split(';')
+        encoding = parts[0].strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[encoding] = quality
+    return qualities
+
+def strip_etag(etag):
+    """
+    Removes the encoding an ``ETag`` was marked with when its response was compressed (``"abc;gzip"`` becomes
+    ``"abc"``), so that conditional requests with the ETag of a compressed response match the response's ETag.
+    """
+    return re.sub(r';[\w-]+$', '', etag)
+
+class ResponseCompression(object):
+    """
+    Compresses the responses of a grid.
+    """
+    def __init__(self, level=6, min_size=1024, encodings=('gzip', 'deflate')):
+        """
+        Initializes a ResponseCompression
+
+        Args:
+            level: The compression level, 1 (fastest) to 9 (smallest). Lower levels save CPU time, higher levels save
+                bandwidth.
+            min_size: Responses smaller than this many bytes are not compressed
+            encodings: The encodings the grid supports, in order of preference
+        """
+        self._level = level
+        self._min_size = min_size
+        self._encodings = encodings
+
+    def get_encoding(self, request):
+        """
+        Returns the encoding a response to a request should be compressed with, or ``None`` if the client doesn't
+        accept any of the supported encodings.
+        """
+        qualities = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        best, best_quality = None, 0.0
+        for encoding in self._encodings:
+            quality = qualities.get(encoding, qualities.get('*', 0.0))
+            if encoding in _encodings and quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress_response(self, request, response):
+        """
+        Compresses a response, if it is large enough and the client accepts one of the supported encodings.
+
+        The ``ETag`` of a compressed response is marked with its encoding (``"abc;gzip"``). ``304 Not Modified``
+        responses keep the marked ``ETag`` the client sent.
+
+        Returns:
+            The response
+        """
+        if response.status_code == 304:
+            return self._mark_not_modified(request, response)
+        if response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            head, content = self._peek(response.streaming_content)
+            response.streaming_content = content
+        else:
+            head = response.content
+        if len(head) < self._min_size:
+            return response
+
+        encoding = self.get_encoding(request)
+        if not encoding:
+            return response
+
+        compressor = _encodings[encoding](self._level)
+        if response.streaming:
+            response.streaming_content = self._compress_sequence(compressor, response.streaming_content)
+            del response['Content-Length']
+        else:
+            content = compressor.compress(response.content) + compressor.finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = str(len(content))
+
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub('"$', ';%s"' % encoding, response['ETag'])
+        response['Content-Encoding'] = encoding
+        return response
+
+    def _mark_not_modified(self, request, response):
+        """
+        Gives a ``304 Not Modified`` response the headers of the ``200`` response it stands for - the ``Vary`` header,
+        and the ``ETag`` of the client's copy if it was compressed with an encoding the client still accepts.
+
+        Returns:
+            The response
+        """
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.get_encoding(request)
+        if encoding and response.has_header('ETag'):
+            etag = '%s;%s' % (parse_etags(response['ETag'])[0], encoding)
+            if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+                response['ETag'] = quote_etag(etag)
+        return response
+
+    def _peek(self, sequence):
+        """
+        Reads the beginning of a sequence of chunks, until it has ``min_size`` bytes or ends.
+
+        Returns:
+            A ``(head, sequence)`` tuple - the bytes read, and a sequence of all the chunks, including the ones read
+        """
+        sequence = iter(sequence)
+        chunks = []
+        size = 0
+        for chunk in sequence:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self._min_size:
+                break
+        return b''.join(chunks), itertools.chain(chunks, sequence)
+
+    def _compress_sequence(self, compressor, sequence):
+        for chunk in sequence:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
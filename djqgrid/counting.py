@@ -0,0 +1,144 @@
+"""
+This module contains the strategies grids use to count their records.
+
+jqGrid needs to know the number of records (and pages) in the grid. Counting the records of a large, filtered table
+can be the slowest part of a grid request, and it happens on every page flip and every sort. A grid can choose how
+its records are counted by setting its ``count_strategy`` attribute to one of the following:
+
+- ``ExactCount`` - a ``COUNT(*)`` query on every request. This is the default.
+- ``CachedCount`` - an exact count, cached in Django's cache framework for a while. The count is cached per grid and
+  query, so paging and sorting the same query reuse the count.
+- ``EstimatedCount`` - the number of rows the database's query planner estimates. This takes no time at all, but is
+  not exact.
+
+A strategy's ``count`` method returns both the count and whether it is exact. The grid passes this on to the client
+in the ``exact`` field of its response. A strategy's ``current`` attribute tells whether its exact counts reflect the
+database at the time of the request - a cached count may be stale. Grids only clamp requested pages to the last
+counted page when the count is exact and current.
+"""
+import hashlib
+import json
+from django.core.cache import get_cache
+from django.db import connections
+
+__author__ = 'zmbq'
+
+class ExactCount(object):
+    """
+    Counts the records with a ``COUNT(*)`` query.
+
+    Attributes:
+        current: True if the strategy's exact counts are always up to date
+    """
+    current = True
+
+    def count(self, queryset, key):
+        """
+        Counts the records of a grid's queryset.
+
+        Args:
+            queryset: The grid's queryset
+            key: A string identifying the grid and its query (but not the requested page or order). Strategies that
+                cache counts use this as their cache key.
+        Returns:
+            A ``(count, exact)`` tuple.
+        """
+        return queryset.count(), True
+
+class CachedCount(ExactCount):
+    """
+    Counts the records with a ``COUNT(*)`` query, and caches the count.
+
+    Cached counts don't include the records added or deleted while they are cached, so they are not ``current``.
+    """
+    current = False
+
+    def __init__(self, timeout=60, cache_alias='default', key_prefix='djqgrid-count'):
+        """
+        Initializes a CachedCount
+
+        Args:
+            timeout: Number of seconds the count is cached for
+            cache_alias: The Django cache the counts are stored in
+            key_prefix: Prefix of the cache keys
+        """
+        self._timeout = timeout
+        self._cache_alias = cache_alias
+        self._key_prefix = key_prefix
+
+    def count(self, queryset, key):
+        cache = get_cache(self._cache_alias)
+        cache_key = '%s:%s' % (self._key_prefix, hashlib.md5(key.encode('utf-8')).hexdigest())
+        count = cache.get(cache_key)
+        if count is None:
+            count = super(CachedCount, self).count(queryset, key)[0]
+            cache.set(cache_key, count, self._timeout)
+        return count, True
+
+def _get_sql(queryset):
+    """
+    Returns the SQL and parameters of a query that selects the queryset's rows, without ordering or joins
+    that are only there for ``select_related``.
+    """
+    query = queryset.values('pk').order_by().query
+    return query.get_compiler(using=queryset.db).as_sql()
+
+def _postgresql_estimate(cursor, sql, params):
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0]
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+def _mysql_estimate(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    column = [desc[0] for desc in cursor.description].index('rows')
+    return int(cursor.fetchone()[column] or 0)
+
+def _sqlite_estimate(cursor, sql, params):
+    # SQLite's planner doesn't estimate row counts. This stand-in counts the rows, so that the estimated count
+    # code path can be used (and tested) on SQLite.
+    cursor.execute('SELECT COUNT(*) FROM (%s)' % sql, params)
+    return cursor.fetchone()[0]
+
+class EstimatedCount(ExactCount):
+    """
+    Uses the database query planner's estimate of the number of records.
+
+    Estimates are supported on PostgreSQL and MySQL. SQLite has a stand-in that actually counts the rows. On other
+    databases the records are counted exactly.
+
+    Estimates of small counts are off by a large factor relative to the count, and small counts are cheap, so if the
+    estimate is below ``exact_below`` the records are counted exactly.
+    """
+    estimators = {
+        'postgresql': _postgresql_estimate,
+        'mysql': _mysql_estimate,
+        'sqlite': _sqlite_estimate,
+    }
+
+    def __init__(self, exact_below=1000):
+        """
+        Initializes an EstimatedCount
+
+        Args:
+            exact_below: Estimates below this number are replaced with an exact count
+        """
+        self._exact_below = exact_below
+
+    def count(self, queryset, key):
+        connection = connections[queryset.db]
+        estimator = self.estimators.get(connection.vendor)
+        if not estimator:
+            return super(EstimatedCount, self).count(queryset, key)
+
+        sql, params = _get_sql(queryset)
+        cursor = connection.cursor()
+        try:
+            estimate = estimator(cursor, sql, params)
+        finally:
+            cursor.close()
+
+        if estimate < self._exact_below:
+            return super(EstimatedCount, self).count(queryset, key)
+        return estimate, False
@@ -0,0 +1,182 @@
+"""
+This module translates jqGrid's searches into Django queries.
+
+jqGrid sends a search in one of two forms, along with ``_search=true``:
+
+- A single field search, in ``searchField``, ``searchOper`` and ``searchString``.
+- An advanced search, in ``filters`` - a JSON object with a ``groupOp`` (``AND`` or ``OR``), a list of ``rules``, each
+  with a ``field``, an ``op`` and ``data``, and optionally a list of nested ``groups``.
+
+Both are translated to a ``Q`` object that filters the grid's queryset in the database. Fields are matched to the
+columns' names, and each column is filtered by its sort name (``Column.get_sort_name``). Rules of columns that can't
+be searched in the database, because their sort names aren't query paths of the grid's model, are ignored.
+
+Each column decides which operators it accepts (see ``Column.get_search_operators``). Operators that match a
+pattern in the middle or the end of a value (``cn``, ``ew`` and their negations) can't use an index, and scan the
+entire table. A column whose field has an index that supports prefix searches can declare it with its
+``search_index`` argument. Such a column only accepts operators that can use the index, and its prefix searches
+(``bw`` and ``bn``) use the declared lookup.
+"""
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q, BooleanField, NullBooleanField
+from django.utils import six
+
+__author__ = 'zmbq'
+
+# Maps each jqGrid operator to its lookup, and whether the lookup is negated
+LOOKUPS = {
+    'eq': ('exact', False),
+    'ne': ('exact', True),
+    'lt': ('lt', False),
+    'le': ('lte', False),
+    'gt': ('gt', False),
+    'ge': ('gte', False),
+    'bw': ('istartswith', False),
+    'bn': ('istartswith', True),
+    'in': ('in', False),
+    'ni': ('in', True),
+    'ew': ('iendswith', False),
+    'en': ('iendswith', True),
+    'cn': ('icontains', False),
+    'nc': ('icontains', True),
+    'nu': ('isnull', False),
+    'nn': ('isnull', True),
+}
+
+# All the operators, in jqGrid's order
+OPERATORS = ('eq', 'ne', 'lt', 'le', 'gt', 'ge', 'bw', 'bn', 'in', 'ni', 'ew', 'en', 'cn', 'nc', 'nu', 'nn')
+
+# The operators that can be answered from an index
+INDEXED_OPERATORS = ('eq', 'ne', 'lt', 'le', 'gt', 'ge', 'bw', 'bn', 'in', 'ni', 'nu', 'nn')
+
+# The maximal number of rules in an advanced search
+MAX_RULES = 100
+
+# Lookups whose values are converted to the field's type
+_typed_lookups = ('exact', 'lt', 'lte', 'gt', 'gte', 'in')
+
+def _to_python(field, value):
+    """
+    Converts a search value to the type of the field it is compared with.
+    """
+    if field is None:
+        return value
+    if isinstance(field, (BooleanField, NullBooleanField)) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'  # This is how jqGrid sends checkbox values
+    try:
+        return field.to_python(value)
+    except (ValidationError, ValueError, TypeError):
+        raise ValueError("Invalid search value '%s'" % value)
+
+def get_rule_filter(column, op, data, get_field):
+    """
+    Returns the ``Q`` object of a single search rule.
+
+    Args:
+        column: The searched column
+        op: The jqGrid operator
+        data: The searched value, as sent by jqGrid
+        get_field: A function that returns the model field a query path ends with, or ``None``. Search values are
+            converted with the field's ``to_python``.
+    Raises:
+        ValueError if the column doesn't accept the operator, or the value is invalid
+    """
+    if op not in column.get_search_operators():
+        raise ValueError("Column '%s' can't be searched with '%s'" % (column.name, op))
+    lookup, negated = LOOKUPS[op]
+    if op in ('bw', 'bn') and column.search_index:
+        lookup = column.search_index
+
+    path = column.get_sort_name()
+    data = six.text_type(data if data is not None else '')
+    if lookup == 'isnull':
+        value = True
+    elif lookup == 'in':
+        field = get_field(path)
+        value = [_to_python(field, item.strip()) for item in data.split(',')]
+    elif lookup in _typed_lookups:
+        value = _to_python(get_field(path), data)
+    else:
+        value = data
+
+    q = Q(**{'%s__%s' % (path, lookup): value})
+    return ~q if negated else q
+
+def _get_group_filter(group, columns, get_field, counter):
+    if not isinstance(group, dict):
+        raise ValueError('Invalid search filters')
+    group_op = group.get('groupOp', 'AND')
+    if group_op not in ('AND', 'OR'):
+        raise ValueError("Invalid search group operator '%s'" % group_op)
+
+    qs = []
+    for rule in group.get('rules') or ():
+        counter[0] += 1
+        if counter[0] > MAX_RULES:
+            raise ValueError('Too many search rules')
+        try:
+            column = columns[six.text_type(rule['field']).lower()]
+            if column is not None:
+                qs.append(get_rule_filter(column, rule['op'], rule.get('data'), get_field))
+        except (KeyError, TypeError):
+            raise ValueError('Invalid search rule %s' % json.dumps(rule))
+    for subgroup in group.get('groups') or ():
+        q = _get_group_filter(subgroup, columns, get_field, counter)
+        if q is not None:
+            qs.append(q)
+
+    if not qs:
+        return None
+    result = qs[0]
+    for q in qs[1:]:
+        result = result & q if group_op == 'AND' else result | q
+    return result
+
+def get_search_filter(querydict, columns, get_field):
+    """
+    Returns the ``Q`` object of jqGrid's search.
+
+    Args:
+        querydict: The request's query dictionary
+        columns: A dictionary mapping column names to the grid's columns. Columns that can't be searched in the
+            database are mapped to ``None``, and their rules are ignored.
+        get_field: A function that returns the model field a query path ends with, or ``None``
+    Returns:
+        The ``Q`` object, or ``None`` if there's no search.
+    Raises:
+        ValueError if the search is invalid
+    """
+    if querydict.get('_search') != 'true':
+        return None
+
+    filters = querydict.get('filters')
+    if filters:
+        try:
+            group = json.loads(filters)
+        except ValueError:
+            raise ValueError('Invalid search filters')
+        return _get_group_filter(group, columns, get_field, [0])
+
+    field = querydict.get('searchField')
+    if not field:
+        return None
+    try:
+        column = columns[field.lower()]
+    except KeyError:
+        raise ValueError("Can't find search field '%s'" % field.lower())
+    if column is None:
+        return None
+    return get_rule_filter(column, querydict.get('searchOper', 'eq'), querydict.get('searchString'), get_field)
+
+def get_filter_paths(q):
+    """
+    Returns the query paths a ``Q`` object filters by (``customer__name`` for ``customer__name__istartswith``).
+    """
+    paths = set()
+    for child in q.children:
+        if isinstance(child, Q):
+            paths |= get_filter_paths(child)
+        else:
+            paths.add(child[0].rsplit('__', 1)[0])
+    return paths
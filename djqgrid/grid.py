@@ -1,12 +1,21 @@
 import copy
+import datetime
+import hashlib
 from zlib import crc32
-from django.core.paginator import Paginator
 from django.core.urlresolvers import reverse
+from django.db import connections
+from django.db.models import Count, Max, OneToOneField
+from django.db.models.query import QuerySet
 from django.utils import six
 from django.utils.datastructures import SortedDict
+import counting
+import filtering
+import keyset
+import timing
 import views
-from columns import Column
+from columns import AnnotatedColumn, Column, ClientOnlyColumn, _is_overridden
 from grid_registrar import register_grid
+from json_helpers import function
 
 __author__ = 'zmbq'
 
@@ -38,15 +47,267 @@ def _get_declared_columns(bases, attrs, with_base_columns=True):
 
     return SortedDict(columns)
 
+def _get_relation(model, name):
+    """
+    Looks up a relation of a model by its attribute name.
+
+    Args:
+        model: The model class
+        name: The attribute name (``customer``, ``orders``, ``order_set``). Query names (as used in ``order_by``)
+            are also accepted.
+    Returns:
+        A ``(related_model, multiple)`` tuple. ``multiple`` is True for relations that return many objects
+        (reverse foreign keys and many-to-many). ``related_model`` is ``None`` if ``name`` is not a relation.
+    """
+    opts = model._meta
+    for field in opts.fields:
+        if field.name == name and field.rel:
+            return field.rel.to, False
+    for field in opts.many_to_many:
+        if field.name == name:
+            return field.rel.to, True
+    for rel in opts.get_all_related_objects():
+        if name in (rel.get_accessor_name(), rel.field.related_query_name()):
+            return rel.model, not isinstance(rel.field, OneToOneField)
+    for rel in opts.get_all_related_many_to_many_objects():
+        if name in (rel.get_accessor_name(), rel.field.related_query_name()):
+            return rel.model, True
+    return None, False
+
+def _plan_related_lookups(model, paths):
+    """
+    Works out the ``select_related`` and ``prefetch_related`` lookups needed to resolve paths without
+    additional queries.
+
+    Args:
+        model: The model class the paths start from
+        paths: Model paths, such as ``customer.region.name`` or ``customer__region__name``
+    Returns:
+        A ``(select_related, prefetch_related)`` tuple of lookup sets.
+
+    Single-valued relations (forward foreign keys and one-to-one fields) are joined with ``select_related``. Once a
+    path crosses a multi-valued relation (reverse foreign keys and many-to-many fields), the rest of the path is
+    prefetched. Path components that are not relations (fields, properties, methods) end the lookup.
+    """
+    select, prefetch = set(), set()
+    for path in paths:
+        current = model
+        joined = []
+        single = 0  # Number of leading single-valued relations
+        for name in path.replace('__', '.').split('.'):
+            current, multiple = _get_relation(current, name)
+            if current is None:
+                break
+            joined.append(name)
+            if not multiple and single == len(joined) - 1:
+                single += 1
+        if single:
+            select.add('__'.join(joined[:single]))
+        if len(joined) > single:
+            prefetch.add('__'.join(joined))
+    return select, prefetch
+
+def _get_path_models(model, paths):
+    """
+    Returns the set of models that paths go through - the model the paths start from, and every model reached through
+    a relation.
+    """
+    models = set([model])
+    for path in paths:
+        current = model
+        for name in path.replace('__', '.').split('.'):
+            current = _get_relation(current, name)[0]
+            if current is None:
+                break
+            models.add(current)
+    return models
+
+def _get_column_paths(columns):
+    """
+    Returns the model paths and sort names of columns.
+    """
+    paths = []
+    for column in columns:
+        if column.model_path:
+            paths.append(column.model_path)
+            paths.append(column.get_sort_name())
+    return paths
+
+def _iterate_in_chunks(queryset, chunk_size, key=None):
+    """
+    Retrieves the models of a queryset with a separate query for each chunk of ``chunk_size`` models, so that only
+    one chunk is in memory at a time.
+
+    ``QuerySet.iterator`` can't be used for this - the database drivers (psycopg2, MySQLdb) read the whole result of
+    a query before returning its first row.
+
+    If ``key`` is given, each chunk after the first is retrieved by seeking from the key of the previous chunk's last
+    model (see ``keyset.filter_beyond``), which takes the same time for every chunk. Otherwise the chunks are
+    retrieved with ``OFFSET``, and deeper chunks take longer.
+
+    Args:
+        queryset: The queryset. May already be sliced, unless ``key`` is given
+        chunk_size: Number of models in a chunk
+        key: A ``(sort_name, descending)`` tuple if the queryset is ordered by ``sort_name`` and then the primary key,
+            and the models contain both, or ``None``
+    Returns:
+        An iterator of lists of models, each list holding up to ``chunk_size`` models.
+    """
+    start = 0
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        if len(chunk) < chunk_size:
+            break
+        if key:
+            sort_name, descending = key
+            last = chunk[-1]
+            following = keyset.filter_beyond(queryset, sort_name, descending,
+                                             keyset.get_path_value(last, sort_name), keyset.get_path_value(last, 'pk'))
+            chunk = list(following[:chunk_size])
+        else:
+            start += chunk_size
+            chunk = list(queryset[start:start + chunk_size])
+
+def _get_concrete_field(model, name):
+    """
+    Returns the concrete field ``name`` of a model (forward relations included), or ``None`` if there's no such field.
+    """
+    opts = model._meta
+    if name == 'pk':
+        return opts.pk
+    for field in opts.fields:
+        if name in (field.name, field.attname):
+            return field
+    return None
+
+def _get_path_fields(model, path):
+    """
+    Returns the list of concrete fields a query path (``customer__region__name``) goes through, or ``None`` if the
+    path doesn't consist of concrete fields.
+    """
+    fields = []
+    for name in path.split('__'):
+        if fields:
+            if not fields[-1].rel:
+                return None
+            model = fields[-1].rel.to
+        field = _get_concrete_field(model, name)
+        if field is None:
+            return None
+        fields.append(field)
+    return fields
+
+def _get_path_field(model, path):
+    """
+    Returns the concrete field a query path (``customer__region__name``) ends with, or ``None`` if the path doesn't
+    consist of concrete fields.
+    """
+    fields = _get_path_fields(model, path)
+    return fields[-1] if fields else None
+
+def _is_query_path(model, path):
+    """
+    Returns True if a query path (``customer__name``, ``orders__title``) consists of fields and relations of the
+    model, so that the model's querysets can be filtered by it.
+    """
+    names = path.split('__')
+    for i, name in enumerate(names):
+        field = _get_concrete_field(model, name)
+        if field is not None:
+            if i == len(names) - 1:
+                return True
+            if not field.rel:
+                return False
+            model = field.rel.to
+            continue
+        model = _get_relation(model, name)[0]
+        if model is None:
+            return False
+    return True
+
+def _get_field_path(model, path):
+    """
+    Resolves a path to the database fields it goes through.
+
+    Args:
+        model: The model class the path starts from
+        path: A model path, such as ``customer.region.name`` or ``customer__region__name``
+    Returns:
+        A ``(field_path, complete)`` tuple. ``field_path`` is the longest prefix of the path that consists of
+        concrete fields, in query form (``customer__region__name``). ``complete`` is True if the entire path is
+        such a prefix, and it ends with a non-relational field - meaning ``values`` can retrieve it.
+    """
+    names = path.replace('__', '.').split('.')
+    current = model
+    joined = []
+    for name in names:
+        field = _get_concrete_field(current, name)
+        if field is None:
+            return '__'.join(joined), False
+        joined.append(name)
+        if field.rel:
+            current = field.rel.to
+        elif len(joined) < len(names):
+            return '__'.join(joined), False
+    return '__'.join(joined), not field.rel
+
+class GridSpec(object):
+    """
+    Everything about a grid that is determined by its class - the columns and what is derived from them.
+
+    A grid class's spec is built once, the first time it is needed (models and URLs can't be inspected while the
+    classes are created), and is shared by all the instances of the class. It must not be modified.
+
+    Attributes:
+        columns: A ``SortedDict`` mapping column attribute names to the grid's columns, in order
+        column_list: A tuple of the columns, in order
+        columns_by_name: A dictionary mapping each column's ``name`` to the column
+        search_columns: ``columns_by_name``, with ``None`` for the columns whose sort names aren't query paths of the
+            model, so they can't be searched in the database
+        col_names: A tuple of the column titles, for ``colNames``
+        col_model: A tuple of the column models, for ``colModel``
+        column_paths: The model paths and sort names of the columns
+        annotated_columns: The ``AnnotatedColumn`` columns, whose values are annotated on the queryset
+        planned_related: The ``(select_related, prefetch_related)`` sets of lookups planned from the columns
+        dependent_models: The models the grid depends on, see ``Grid.get_dependent_models``
+        url: The URL of the grid's data
+        export_url: The URL of the grid's CSV export
+    """
+    def __init__(self, gridcls):
+        self.columns = gridcls.base_columns
+        self.column_list = tuple(self.columns.values())
+        self.columns_by_name = dict((column.name, column) for column in self.column_list)
+        self.search_columns = dict((column.name, column if _is_query_path(gridcls.model, column.get_sort_name())
+                                                   else None)
+                                   for column in self.column_list)
+        self.col_names = tuple(column.title for column in self.column_list)
+        self.col_model = tuple(column.model for column in self.column_list)
+        self.column_paths = tuple(_get_column_paths(self.column_list))
+        self.annotated_columns = tuple(column for column in self.column_list if isinstance(column, AnnotatedColumn))
+        self.planned_related = _plan_related_lookups(gridcls.model, self.column_paths)
+        lookup_paths = [path for column in self.annotated_columns for path in column.get_lookup_paths()]
+        self.dependent_models = frozenset(_get_path_models(gridcls.model, self.column_paths + tuple(lookup_paths)))
+        self.url = reverse(views.query, kwargs = {'grid_id': gridcls.get_grid_id()})
+        self.export_url = reverse(views.export, kwargs = {'grid_id': gridcls.get_grid_id()})
+
 class DeclarativeColumnsMetaclass(type):
     """
     Metaclass that converts Column attributes to a dictionary called
     'base_columns', taking into account parent class 'base_columns' as well.
+
+    Grid classes with a model are registered when they are created.
     """
     def __new__(cls, name, bases, attrs):
         attrs['base_columns'] = _get_declared_columns(bases, attrs)
         new_class = super(DeclarativeColumnsMetaclass,
                      cls).__new__(cls, name, bases, attrs)
+        if getattr(new_class, 'model', None) is not None:
+            register_grid(new_class)
+        if new_class.response_cache:
+            new_class.response_cache.register(new_class)
+        elif new_class.page_prefetch:
+            raise ValueError("%s prefetches pages, but has no response_cache" % name)
         return new_class
 
 class BaseGrid(object):
@@ -57,7 +318,89 @@ class BaseGrid(object):
 
     Attributes:
         model: The model's class this grid will show. Each grid row will show information of one model instance.
+        auto_related: If True (the default), ``select_related`` and ``prefetch_related`` lookups are planned
+            automatically from the columns' model paths and sort names. Set to False to opt out.
+        select_related: Additional ``select_related`` lookups to apply on the grid's queryset.
+        prefetch_related: Additional ``prefetch_related`` lookups to apply on the grid's queryset.
+        values_projection: If True, only the fields the columns need are retrieved from the database. If all
+            the columns can be rendered from values (see ``Column.get_value_path``), rows are retrieved with
+            ``values`` and no model instances are created. Otherwise, model instances are retrieved with
+            ``only``, as long as it's known which fields the rows need - if columns with templates or custom
+            rendering, or ``_get_additional_data``, may access other fields, complete model instances are retrieved
+            unless ``only_fields`` is set. The default is False.
+        only_fields: Additional fields to retrieve when ``values_projection`` falls back to ``only`` - list the
+            fields your templates and ``_get_additional_data`` access here. Setting it lets grids whose columns
+            aren't plain model paths use ``only``. Fields that are not retrieved cost a query per row when accessed.
+        keyset_pagination: If True, pages adjacent to the page the client displays are retrieved by seeking from
+            the displayed page's rows, instead of with ``OFFSET``. This keeps moving to the next and previous pages
+            fast no matter how deep they are. Only columns whose sort names are non-nullable fields are seeked. See
+            the ``keyset`` module. The default is False.
+        count_strategy: How the grid's records are counted - an ``ExactCount``, ``CachedCount`` or
+            ``EstimatedCount`` from the ``counting`` module. The default is an exact ``COUNT(*)`` on every request.
+            With the other strategies, requested pages beyond the counted pages are retrieved rather than clamped to
+            the last page, and an empty page triggers an exact count.
+        response_cache: A ``caching.ResponseCache`` that caches the grid's responses in the ``query`` view. The
+            cached responses are invalidated whenever the grid's model, or a model the columns refer to, is changed.
+            The default is None - responses are not cached.
+        conditional: If True, the ``query`` view supports conditional requests - it sends an ``ETag`` with each
+            response, and answers requests whose ``If-None-Match`` matches the current ``ETag`` with a
+            ``304 Not Modified``, without querying or rendering any rows. See ``get_version``. The default is False.
+        version_field: A field that changes whenever a record changes, such as an ``updated_at`` timestamp. Used by
+            ``get_version``.
+        stream_rows: Responses with pages of at least this many rows (such as grids without a pager) are streamed
+            to the client as they are rendered. The default is 1000. Set to None to never stream responses. Grids
+            that override ``get_json_data`` or have a ``query_audit`` are never streamed.
+        stream_chunk_size: Number of models retrieved from the database at a time when a response is streamed.
+        server_search: If True, jqGrid's searches are applied on the grid's queryset in the database. See the
+            ``filtering`` module. Searches of columns whose sort names aren't query paths of the model (such as
+            properties) are ignored. The default is False - searches are left to ``_apply_query``.
+        compact_rows: If True, rows are sent in a compact format - each row is a list of its cells' texts, followed
+            by a dictionary with the ``html`` of the cells whose HTML differs from their text, and the ``additional``
+            data, if there are any. ``get_options`` sets jqGrid's ``jsonReader`` to read this format, and
+            ``customHtmlFormatter`` handles both formats. The default is False.
+        compression: A ``compression.ResponseCompression`` that compresses the grid's large responses in the
+            ``query`` view, if the client accepts it. The default is None - responses are not compressed.
+        instrumentation: A ``timing.Instrumentation`` that times the phases of the grid's requests in the ``query``
+            view. The default is None - requests are not timed.
+        query_audit: An ``auditing.QueryAudit`` that checks the queries of ``get_json_data`` for repeated queries
+            (N+1 queries), and for exceeding a budget. Meant for development and tests. The default is None.
+        csv_export: If True, the grid's rows can be exported as CSV by the ``export`` view, with the grid's current
+            search and sort. ``get_options`` passes the export URL to jqGrid in the ``exportUrl`` option, which
+            ``exportGrid`` in ``djqgrid_utils.js`` uses. The default is False.
+        export_chunk_size: Number of models retrieved from the database at a time when the grid is exported.
+        page_prefetch: A ``prefetching.PagePrefetcher`` that renders the pages adjacent to each page the ``query``
+            view serves in the background, and stores them in the ``response_cache``, which must be set. The default
+            is None - pages are not prefetched.
     """
+    auto_related = True
+    select_related = ()
+    prefetch_related = ()
+    values_projection = False
+    only_fields = ()
+    keyset_pagination = False
+    count_strategy = counting.ExactCount()
+    response_cache = None
+    conditional = False
+    version_field = None
+    stream_rows = 1000
+    stream_chunk_size = 100
+    server_search = False
+    compact_rows = False
+    compression = None
+    instrumentation = None
+    query_audit = None
+    csv_export = False
+    export_chunk_size = 1000
+    page_prefetch = None
+
+    # The Timings of the current request, if it is being timed
+    _timings = None
+    # The auditing.QueryRecorder of the current request, if it is being audited
+    _recorder = None
+
+    # Query string parameters that select a page of the grid's query, rather than the query itself
+    _paging_parameters = ('page', 'rows', 'sidx', 'sord', 'nd', 'keyset')
+
     _default_options = dict(datatype = 'json',
                             mtype = 'get',
                             viewrecords = True,
@@ -85,10 +428,8 @@ class BaseGrid(object):
 
         For more information, see the ``json_helpers`` module.
         """
-        self._columns = copy.deepcopy(self.base_columns)
         self._options = BaseGrid._default_options.copy()
         self._options.update(kwargs)
-        register_grid(self.__class__)
 
     @classmethod
     def get_grid_id(cls):
@@ -100,9 +441,33 @@ class BaseGrid(object):
         """
         return '%X' % abs(crc32(cls.__name__))
 
+    @classmethod
+    def get_dependent_models(cls):
+        """
+        Returns the set of models the grid's data depends on - the grid's model, and the models the columns' model
+        paths and sort names go through.
+        """
+        return cls.get_spec().dependent_models
+
+    @classmethod
+    def get_spec(cls):
+        """
+        Returns the grid class's ``GridSpec``, building it the first time it is needed.
+        """
+        spec = cls.__dict__.get('_spec')
+        if spec is None:
+            spec = GridSpec(cls)
+            cls._spec = spec  # Building the spec twice in concurrent requests is harmless
+        return spec
+
     @property
     def columns(self):
-        return self._columns
+        """
+        The grid's columns - a ``SortedDict`` mapping column attribute names to columns.
+
+        The columns are shared by all the instances of the grid class, and must not be modified.
+        """
+        return self.get_spec().columns
 
     def get_options(self, override = None):
         """
@@ -118,17 +483,72 @@ class BaseGrid(object):
         - ``colNames`` are created from the grid's ``Column`` fields
         - ``colModels`` are also created from the grid's ``Column`` fields.
         - ``url`` always points to the ``djqgrid.views.query`` view with the grid's ID.
+
+        If ``compact_rows`` is set, ``jsonReader`` defaults to a reader of the compact row format.
+
+        If ``keyset_pagination`` is set, ``serializeGridData`` defaults to ``keysetSerializeGridData``, which sends
+        the cursor of the displayed page back to the server.
         """
+        spec = self.get_spec()
         options = self._options.copy()
         if override:
             options.update(override)
 
-        options['colNames'] = [col.title for col in self.columns.values()]
-        options['colModel'] = [col.model for col in self.columns.values()]
-        options['url'] = reverse(views.query, kwargs = {'grid_id': self.get_grid_id()})
+        options['colNames'] = list(spec.col_names)
+        options['colModel'] = copy.deepcopy(list(spec.col_model))  # The spec's column models are shared
+        options['url'] = spec.url
+        if self.csv_export:
+            options['exportUrl'] = spec.export_url
+        if self.compact_rows:
+            options.setdefault('jsonReader', self._get_compact_reader())
+        if self.keyset_pagination:
+            options.setdefault('serializeGridData', function('keysetSerializeGridData'))
+        if self.conditional:
+            # jqGrid adds a timestamp (nd) to each request, which prevents the browser from revalidating its cache
+            prmNames = dict(options.get('prmNames') or {})
+            prmNames.setdefault('nd', None)
+            options['prmNames'] = prmNames
 
         return options
 
+    def _get_compact_reader(self):
+        """
+        Returns the ``jsonReader`` of the compact row format - rows are arrays, and the row ID is the key column's
+        cell, if the grid has one.
+        """
+        reader = {'repeatitems': True, 'cell': ''}
+        for index, column in enumerate(self.get_spec().column_list):
+            if column.model.get('key'):
+                reader['id'] = str(index)
+                break
+        return reader
+
+    def _values_to_dict(self, values, paths):
+        """
+        Takes a row retrieved with ``values`` and converts it to a Python dictionary that will be sent to the
+        jqGrid.
+
+        This is the ``values_projection`` counterpart of ``_model_to_dict``, and produces the same dictionary.
+
+        Args:
+            values: A dictionary mapping value paths to values
+            paths: The value path of each column, as returned by ``_get_value_paths``
+        """
+        result = {}
+        html = {}
+        for column, path in zip(self.get_spec().column_list, paths):
+            result[column.name] = html[column.name] = column.render_value(values[path] if path else None)
+        result['html'] = html
+        return result
+
+    def _values_to_list(self, values, paths):
+        """
+        The ``compact_rows`` counterpart of ``_values_to_dict``. The HTML of values is their text, so the row is just
+        the list of texts.
+        """
+        return [column.render_value(values[path] if path else None)
+                for column, path in zip(self.get_spec().column_list, paths)]
+
     def _model_to_dict(self, model):
         """
         Takes a model and converts it to a Python dictionary that will be sent to the jqGrid.
@@ -156,19 +576,125 @@ class BaseGrid(object):
         }
         """
 
+        columns = self.get_spec().column_list
+        return self._cells_to_dict(columns, [column.render_cell(model) for column in columns],
+                                   self._get_page_additional_data([model])[0])
+
+    def _models_to_dicts(self, models):
+        """
+        Converts a page of models to the Python dictionaries that will be sent to the jqGrid.
+
+        The result is the same as calling ``_model_to_dict`` for each model, but the page is rendered column by
+        column, using ``Column.render_cells``, which lets columns share work between cells. If ``_model_to_dict``
+        is overridden, it is called for each model instead.
+
+        If ``compact_rows`` is set, the rows are lists, see ``_cells_to_list``.
+        """
+        if _is_overridden(self, BaseGrid, '_model_to_dict'):
+            rows = [self._model_to_dict(model) for model in models]
+            if self.compact_rows:
+                rows = [self._dict_to_list(row) for row in rows]
+            return rows
+        columns = self.get_spec().column_list
+        if self._timings is None and self._recorder is None:
+            rows_cells = zip(*[column.render_cells(models) for column in columns])
+        else:
+            rows_cells = zip(*[self._render_column_cells(column, models) for column in columns])
+        additional = self._get_page_additional_data(models)
+        to_row = self._cells_to_list if self.compact_rows else self._cells_to_dict
+        return [to_row(columns, cells, extra) for cells, extra in zip(rows_cells, additional)]
+
+    def _cells_to_dict(self, columns, cells, additional):
+        """
+        Builds the dictionary of a model from its rendered cells (see ``_model_to_dict``).
+
+        Args:
+            columns: The grid's columns
+            cells: The ``(text, html)`` tuple of each column
+            additional: The model's additional data, or ``None``
+        """
         result = {}
         html = {}
-        for column in self.columns.values():
-            title = column.title.lower()
-            result[title] = column.render_text(model)
-            html[title] = column.render_html(model)
+        for column, (text, cell_html) in zip(columns, cells):
+            result[column.name] = text
+            html[column.name] = cell_html
         result['html'] = html
 
-        additional = self._get_additional_data(model)
         if additional:
             result['additional'] = additional
         return result
 
+    def _cells_to_list(self, columns, cells, additional):
+        """
+        Builds the ``compact_rows`` list of a model from its rendered cells.
+
+        The list contains the text of each column. If any column's HTML differs from its text, or there's additional
+        data, the list ends with a dictionary with the ``html`` of those columns and the ``additional`` data.
+        """
+        result = []
+        html = {}
+        for column, (text, cell_html) in zip(columns, cells):
+            result.append(text)
+            if cell_html != text:
+                html[column.name] = cell_html
+        return self._append_extra(result, html, additional)
+
+    def _dict_to_list(self, row):
+        """
+        Converts a row dictionary returned by ``_model_to_dict`` to the ``compact_rows`` format.
+        """
+        result = []
+        html = {}
+        row_html = row.get('html', {})
+        for column in self.get_spec().column_list:
+            text = row.get(column.name)
+            result.append(text)
+            if column.name in row_html and row_html[column.name] != text:
+                html[column.name] = row_html[column.name]
+        return self._append_extra(result, html, row.get('additional'))
+
+    def _append_extra(self, row, html, additional):
+        extra = {}
+        if html:
+            extra['html'] = html
+        if additional:
+            extra['additional'] = additional
+        if extra:
+            row.append(extra)
+        return row
+
+    def _render_column_cells(self, column, models):
+        """
+        Calls ``column.render_cells``, timing and auditing it if the request is being timed or audited.
+        """
+        with self.timed('column.%s' % column.__class__.__name__), self.audited('column %s' % column.name):
+            return column.render_cells(models)
+
+    def _get_page_additional_data(self, models):
+        """
+        Calls ``_get_additional_data_bulk``, timing and auditing it if the request is being timed or audited.
+        """
+        if self._timings is None and self._recorder is None:
+            return self._get_additional_data_bulk(models)
+        with self.timed('additional'), self.audited('_get_additional_data'):
+            return self._get_additional_data_bulk(models)
+
+    def _get_additional_data_bulk(self, models):
+        """
+        Retrieves the additional data of a page of models (see ``_get_additional_data``).
+
+        Override this instead of ``_get_additional_data`` when the additional data comes from other tables - a single
+        query can then retrieve the data of the entire page, instead of a query for each row.
+
+        The default implementation calls ``_get_additional_data`` for each model.
+
+        Args:
+            models: The models of the page's rows
+        Returns:
+            A list with the additional data of each model (a dictionary, or ``None``)
+        """
+        return [self._get_additional_data(model) for model in models]
+
     def _get_additional_data(self, model):
         """
         Retrieves additional data to be sent back to the client.
@@ -195,25 +721,48 @@ class BaseGrid(object):
             An ordered queryset.
         """
 
+        sort_name, descending = self._get_sort(querydict)
+        sorder = '-' if descending else ''
+        if self.keyset_pagination:
+            # Keyset pagination requires a unique order, so the primary key is added as a tie-breaker
+            if sort_name == 'pk':
+                return queryset.order_by(sorder + 'pk')
+            return queryset.order_by(sorder + sort_name, sorder + 'pk')
+        if not sort_name:
+            return queryset  # No sorting applied
+        return queryset.order_by(sorder + sort_name)
+
+    def _get_sort(self, querydict):
+        """
+        Returns the sorting requested by jqGrid in ``sidx`` and ``sord``.
+
+        Args:
+            querydict: The request's querydict
+        Returns:
+            A ``(sort_name, descending)`` tuple. ``sort_name`` is the sort name of the sorted column. If no sorting
+            was requested, it is ``None`` - or ``'pk'`` if ``keyset_pagination`` is set, since keyset pagination
+            always orders by the primary key.
+        Raises:
+            ValueError if ``sidx`` is not one of the grid's columns
+        """
         try:
             sidx = querydict['sidx']
             if not sidx:
-                sidx = self.columns.values()[0].title
-            sorder = '' if querydict['sord']=='asc' else '-'
+                sidx = self.get_spec().column_list[0].title
+            descending = querydict['sord'] != 'asc'
         except KeyError:
-            return queryset  # No sorting applied
-        for column in self.columns.values():
-            if sidx.lower()==column.title.lower():
-                order = sorder + column.get_sort_name()
-                return queryset.order_by(order)
-        raise ValueError("Can't find index field '%s'" % sidx)
+            return ('pk' if self.keyset_pagination else None), False
+        column = self.get_spec().columns_by_name.get(sidx.lower())
+        if column is None:
+            raise ValueError("Can't find index field '%s'" % sidx.lower())
+        return column.get_sort_name(), descending
 
     def _apply_query(self, queryset, querydict):
         """
         This function lets a Grid instance change the default query, if it's ever necessary
 
         Args:
-            queryset: The default query (``self.model.objects``)
+            queryset: The default query (``self.model.objects.all()``)
             querydict: The request's query string
         Returns:
             The actual queryset to use
@@ -222,6 +771,30 @@ class BaseGrid(object):
         """
         return queryset
 
+    def _apply_search(self, queryset, querydict):
+        """
+        Filters the queryset by jqGrid's search, if ``server_search`` is set.
+
+        Args:
+            queryset: The grid's queryset
+            querydict: The request's query dictionary
+        Returns:
+            The filtered queryset
+        Raises:
+            ValueError if the search is invalid
+        """
+        if not self.server_search:
+            return queryset
+        q = filtering.get_search_filter(querydict, self.get_spec().search_columns,
+                                        lambda path: _get_path_field(self.model, path))
+        if q is None:
+            return queryset
+        queryset = queryset.filter(q)
+        if _plan_related_lookups(self.model, filtering.get_filter_paths(q))[1]:
+            # Searching through a multi-valued relation returns a row for each matching related object
+            queryset = queryset.distinct()
+        return queryset
+
     def _get_query_results(self, querydict):
         """
         Returns a queryset to populate the grid
@@ -229,14 +802,397 @@ class BaseGrid(object):
         Args:
             querydict: The request's query dictionary
         Returns:
-            The queryset that will be used to populate the grid. Paging will be applied by the caller.
+            The queryset that will be used to populate the grid. Paging, and the annotations of the grid's
+            ``AnnotatedColumn`` columns (see ``_apply_annotations``), will be applied by the caller.
         """
-        queryset = self.model.objects
+        queryset = self.model.objects.all()
         queryset = self._apply_query(queryset, querydict)
+        queryset = self._apply_search(queryset, querydict)
+        queryset = self._apply_related(queryset)
         queryset = self._apply_sort(queryset, querydict)
 
         return queryset
 
+    def _apply_annotations(self, queryset):
+        """
+        Annotates the queryset with the values of the grid's ``AnnotatedColumn`` columns, such as ``AggregateColumn``.
+
+        The annotations are not part of ``_get_query_results``, since counting an annotated queryset wraps the
+        ``COUNT`` in a subquery that computes the annotations. They are applied on the queryset of the page, after
+        the records are counted, and on the queryset of the export.
+
+        The annotations are applied after the search, so an aggregate only covers the related rows the search
+        matched if the search filters on the aggregated relation.
+        """
+        for column in self.get_spec().annotated_columns:
+            queryset = column.annotate(queryset)
+        return queryset
+
+    def _get_related_lookups(self):
+        """
+        Returns the ``select_related`` and ``prefetch_related`` lookups of the grid.
+
+        Returns:
+            A ``(select_related, prefetch_related)`` tuple of sorted lookup lists. These are the grid's
+            ``select_related`` and ``prefetch_related`` attributes, plus the lookups planned from the columns
+            if ``auto_related`` is set.
+        """
+        select = set(self.select_related)
+        prefetch = set(self.prefetch_related)
+        if self.auto_related:
+            planned_select, planned_prefetch = self.get_spec().planned_related
+            select |= planned_select
+            prefetch |= planned_prefetch
+        return sorted(select), sorted(prefetch)
+
+    def _apply_related(self, queryset):
+        """
+        Applies ``select_related`` and ``prefetch_related`` on the queryset, so that related objects the columns
+        access are retrieved along with the page, and not with one query per row.
+
+        Args:
+            queryset: The grid's queryset
+        Returns:
+            The queryset with the related lookups applied.
+        """
+        select, prefetch = self._get_related_lookups()
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def _get_value_paths(self):
+        """
+        Returns the value path of each column, or ``None`` if the rows must be rendered from model instances.
+
+        Columns that need no value from the database (such as ``ClientOnlyColumn``) have an empty value path.
+        """
+        if self.prefetch_related or self._has_custom_additional_data():
+            return None
+        return self._get_column_value_paths()
+
+    def _has_custom_additional_data(self):
+        """ Returns True if the grid overrides ``_get_additional_data`` or ``_get_additional_data_bulk`` """
+        return (_is_overridden(self, BaseGrid, '_get_additional_data') or
+                _is_overridden(self, BaseGrid, '_get_additional_data_bulk'))
+
+    def _get_column_value_paths(self):
+        """
+        Returns the value path of each column, or ``None`` if some columns aren't plain model paths - they must be
+        rendered from model instances, and may access any of the model's fields.
+        """
+        paths = []
+        spec = self.get_spec()
+        for column in spec.column_list:
+            path = column.get_value_path()
+            if path is None:
+                return None
+            if path and column not in spec.annotated_columns and not _get_field_path(self.model, path)[1]:
+                return None
+            paths.append(path)
+        return paths
+
+    def _get_only_fields(self):
+        """
+        Returns the fields ``only`` should retrieve when the rows are rendered from model instances.
+
+        These are the fields along the columns' model paths and sort names, the fields of the ``select_related``
+        and ``prefetch_related`` lookups, and the grid's ``only_fields``.
+        """
+        fields = set(self.only_fields)
+        select, prefetch = self._get_related_lookups()
+        paths = select + prefetch + list(self.get_spec().column_paths)
+        for path in paths:
+            field_path = _get_field_path(self.model, path)[0]
+            if field_path:
+                fields.add(field_path)
+        return sorted(fields)
+
+    def _apply_projection(self, queryset, extra_paths=()):
+        """
+        Restricts the fields retrieved by the queryset, if ``values_projection`` is set.
+
+        Args:
+            queryset: The grid's queryset
+            extra_paths: Paths that must be retrieved in addition to the columns' values
+        Returns:
+            A ``(queryset, value_paths)`` tuple. ``value_paths`` is the value path of each column if the rows are
+            retrieved as ``values`` dictionaries, or ``None`` if the queryset returns model instances.
+
+        If the rows are rendered from model instances, and the grid has no ``only_fields``, ``only`` is only used if
+        the columns are plain model paths and ``_get_additional_data`` is not overridden. Otherwise the fields the
+        rows access are unknown, and deferring them would cost a query per row, so complete instances are retrieved.
+        """
+        if not self.values_projection:
+            return queryset, None
+        paths = self._get_value_paths()
+        if paths is not None:
+            fetched = [path for path in paths if path]
+            fetched += [path for path in extra_paths if path not in fetched]
+            return queryset.values(*fetched), paths
+        if not self.only_fields and (self._get_column_value_paths() is None or self._has_custom_additional_data()):
+            return queryset, None
+        fields = self._get_only_fields()
+        fields += [path for path in extra_paths if path != 'pk']
+        return queryset.only(*fields), None
+
+    def _get_page_size(self, querydict):
+        """
+        Returns the number of rows in a page.
+
+        jqGrid passes the page size in the ``rows`` query string parameter. If it's missing or invalid, the grid's
+        ``rowNum`` option is used.
+        """
+        default = self._options.get('rowNum', 20)
+        try:
+            rows = int(querydict.get('rows', default))
+        except (TypeError, ValueError):
+            rows = default
+        return rows if rows > 0 else default
+
+    def _get_page_number(self, querydict, total_pages=None):
+        """
+        Returns the number of the page that should be returned, a number between 1 and ``total_pages``.
+
+        jqGrid passes the page number in the ``page`` query string parameter. Pages beyond the last page are
+        clamped to the last page, so that the client is never sent an empty page of an existing result set. If
+        ``total_pages`` is ``None`` (the number of records is not known for sure), the page is not clamped.
+        """
+        try:
+            page = int(querydict.get('page', '1'))
+        except (TypeError, ValueError):
+            page = 1
+        if total_pages is not None:
+            page = min(page, total_pages)
+        return max(1, page)
+
+    def _get_query_key(self, querydict, exclude=(), defaults=None):
+        """
+        Returns a string that identifies the grid's query, for use in cache keys.
+
+        The string consists of the grid's ID and the request's query parameters, sorted by name.
+
+        Args:
+            querydict: The request's query dictionary
+            exclude: Names of parameters to leave out of the key
+            defaults: A dictionary of default parameter values, used for parameters missing from the querydict
+        """
+        if hasattr(querydict, 'lists'):
+            items = dict(querydict.lists())
+        else:
+            items = dict((name, [value]) for name, value in querydict.items())
+        for name, value in (defaults or {}).items():
+            items.setdefault(name, [value])
+        items = sorted((six.text_type(name), [six.text_type(value) for value in values])
+                       for name, values in items.items() if name not in exclude)
+        return '%s?%s' % (self.get_grid_id(), repr(items))
+
+    def get_request_key(self, querydict):
+        """
+        Returns a string that identifies the response to a request, for use in cache keys.
+
+        Requests that differ only in parameters that don't affect the response (such as jqGrid's ``nd``) or in
+        parameters that are set to their default values have the same key.
+
+        Args:
+            querydict: The request's query dictionary
+        """
+        defaults = {'page': '1', 'rows': str(self._get_page_size({})), '_search': 'false'}
+        return self._get_query_key(querydict, exclude=('nd', 'keyset'), defaults=defaults)
+
+    def get_version(self, querydict):
+        """
+        Returns a version of the grid's data for a request. The version changes whenever the data changes, and it
+        should be a lot cheaper to compute than the data itself.
+
+        The default implementation uses the grid's ``version_field``, if set - the version consists of the field's
+        maximal value and the number of records, retrieved in a single aggregate query over the grid's queryset.
+        Otherwise, the version consists of the model versions maintained by the grid's ``response_cache``, which
+        requires no query at all.
+
+        Override this method to provide another version, such as a version counter of your own.
+
+        Args:
+            querydict: The request's query dictionary
+        Returns:
+            A ``(version, last_modified)`` tuple. ``version`` is a string, ``last_modified`` is the last time the data
+            was modified, or ``None`` if that's unknown.
+        Raises:
+            ValueError if the grid has neither a ``version_field`` nor a ``response_cache``
+        """
+        if self.version_field:
+            queryset = self._get_query_results(querydict).order_by()
+            result = queryset.aggregate(last_modified=Max(self.version_field), count=Count('pk'))
+            last_modified = result['last_modified']
+            if not isinstance(last_modified, datetime.datetime):
+                last_modified = None
+            return '%s|%s' % (result['last_modified'], result['count']), last_modified
+        if self.response_cache:
+            return repr(self.response_cache.get_versions(self.get_dependent_models())), None
+        raise ValueError("%s has neither a version_field nor a response_cache" % self.__class__.__name__)
+
+    def get_etag(self, querydict):
+        """
+        Returns the ``ETag`` of the grid's response to a request, based on ``get_version``.
+
+        Returns:
+            An ``(etag, last_modified)`` tuple, ``last_modified`` is taken from ``get_version``.
+        """
+        version, last_modified = self.get_version(querydict)
+        key = '%s|%s' % (self.get_request_key(querydict), version)
+        return hashlib.md5(key.encode('utf-8')).hexdigest(), last_modified
+
+    def _count_records(self, queryset, querydict):
+        """
+        Returns the number of records in the queryset.
+
+        The records are counted by the grid's ``count_strategy``. By default this is done with a single
+        ``COUNT(*)`` query - the records themselves are not retrieved.
+
+        Returns:
+            A ``(records, exact)`` tuple. ``exact`` is False if ``records`` is an estimate.
+        """
+        key = self._get_query_key(querydict, exclude=self._paging_parameters)
+        return self.count_strategy.count(queryset, key)
+
+    def _get_page(self, queryset, page, rows):
+        """
+        Returns the models of one page.
+
+        Args:
+            queryset: The grid's queryset, with sorting already applied
+            page: The 1-based page number
+            rows: Number of rows in a page
+        Returns:
+            The page's models. Only the page's rows are retrieved from the database (using ``LIMIT`` and ``OFFSET``).
+        """
+        start = (page - 1) * rows
+        return queryset[start:start + rows]
+
+    def _get_keyset_field(self, querydict):
+        """
+        Returns the ``(sort_name, descending, field)`` of the grid's order if the grid can use keyset pagination,
+        or ``None`` if it can't - because ``keyset_pagination`` is not set, or the sort name doesn't refer to a
+        concrete field, or the field can be NULL (NULLs can't be compared). The field can also be NULL if it is
+        reached through a nullable foreign key.
+        """
+        if not self.keyset_pagination:
+            return None
+        sort_name, descending = self._get_sort(querydict)
+        fields = _get_path_fields(self.model, sort_name)
+        if fields is None or any(field.null for field in fields):
+            return None
+        return sort_name, descending, fields[-1]
+
+    def _get_keyset_query(self, querydict):
+        """
+        Returns a hash of the request's query without its paging parameters, which ties keyset cursors to the query
+        they were created for.
+        """
+        key = self._get_query_key(querydict, exclude=self._paging_parameters)
+        return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def _get_keyset_page(self, queryset, querydict, page, rows):
+        """
+        Returns the models of one page using keyset pagination.
+
+        Args:
+            queryset: The grid's queryset, with sorting already applied
+            querydict: The request's query dictionary, with the ``keyset`` cursor sent by the client
+            page: The 1-based page number
+            rows: Number of rows in a page
+        Returns:
+            The page's models, or ``None`` if the page can't be retrieved by seeking, in which case ``_get_page``
+            should be used.
+        """
+        key = self._get_keyset_field(querydict)
+        cursor = keyset.parse_cursor(querydict.get('keyset'))
+        if key is None or cursor is None:
+            return None
+        sort_name, descending, field = key
+        return keyset.seek(queryset, cursor, field, sort_name, descending, page, rows,
+                           self._get_keyset_query(querydict))
+
+    def _get_page_models(self, querydict):
+        """
+        Counts the grid's records, and prepares the retrieval of the requested page.
+
+        Args:
+            querydict: The request's query dictionary
+        Returns:
+            A ``(response, models, value_paths)`` tuple. ``response`` is the response dictionary, without the rows.
+            ``models`` is an iterable of the page's models - or ``values`` dictionaries, if ``value_paths`` is not
+            ``None`` (see ``_apply_projection``). It is either a queryset or a list.
+        """
+        with self.timed('query'):
+            queryset = self._get_query_results(querydict)
+
+        rows = self._get_page_size(querydict)
+        with self.timed('count'):
+            records, exact = self._count_records(queryset, querydict)
+        # Only an exact count of the current records tells for sure which pages exist. Estimated and cached counts
+        # may be off, so the requested page is retrieved as is, and the count is checked against it.
+        current = exact and self.count_strategy.current
+        page = self._get_page_number(querydict, (records + rows - 1) // rows if current else None)
+        key = self._get_keyset_field(querydict)
+        counted = queryset
+        queryset = self._apply_annotations(queryset)
+        queryset, value_paths = self._apply_projection(queryset, (key[0], 'pk') if key else ())
+
+        models = []
+        if records or not current:
+            models = None
+            if key:
+                with self.timed('page'):
+                    models = self._get_keyset_page(queryset, querydict, page, rows)
+            if models is None:
+                models = self._get_page(queryset, page, rows)
+            if not current:
+                with self.timed('page'):
+                    models = list(models)
+                if len(models) == rows:
+                    # The records up to the end of the page exist, even if the count says otherwise
+                    records = max(records, page * rows)
+                elif models:
+                    # This is the last page
+                    records = (page - 1) * rows + len(models)
+                elif records or page > 1:
+                    # The page is beyond the last page, count the records to find the last page
+                    with self.timed('count'):
+                        records, exact = counted.count(), True
+                    page = self._get_page_number(querydict, (records + rows - 1) // rows)
+                    models = self._get_page(queryset, page, rows) if records else []
+
+        response = {'page': page,
+                    'total': (records + rows - 1) // rows,
+                    'records': records,
+                    'exact': exact}
+        return response, models, value_paths
+
+    def _iter_rows(self, chunks, value_paths):
+        """
+        Converts models to the dictionaries sent to the jqGrid, one chunk of models at a time.
+
+        Args:
+            chunks: An iterable of lists of models, or of ``values`` dictionaries if ``value_paths`` is not ``None``
+            value_paths: The value path of each column, or ``None``
+        """
+        to_row = self._values_to_list if self.compact_rows else self._values_to_dict
+        chunks = iter(chunks)
+        while True:
+            with self.timed('page'):
+                models = next(chunks, None)
+            if models is None:
+                break
+            with self.timed('render'):
+                if value_paths is not None:
+                    rows = [to_row(values, value_paths) for values in models]
+                else:
+                    rows = self._models_to_dicts(models)
+            for row in rows:
+                yield row
+
     def get_json_data(self, querydict):
         """
         Returns a JSON string with the grid's contents
@@ -246,22 +1202,190 @@ class BaseGrid(object):
         Returns:
             JSON string with the grid's contents
 
+        Retrieving a page takes two queries - one ``COUNT(*)`` query and one query that fetches the page's rows.
+        If there are no records, the second query is skipped.
+
+        The response's ``exact`` field is False if the number of records is an estimate (see ``count_strategy``).
+
+        If ``keyset_pagination`` is set, the response's ``userdata`` contains a ``keyset`` cursor, which the client
+        sends back with its next request.
+
+        If the grid has a ``query_audit``, its queries are audited.
+
         *DO NOT* override this method unless absolutely necessary. ``_apply_query`` and ``_get_additional_data`` should
         be overridden instead.
         """
+        if self.query_audit:
+            self._recorder = self.query_audit.start(self)
+        try:
+            response, models, value_paths = self._get_page_models(querydict)
+            with self.timed('page'):
+                models = list(models)
+            response['rows'] = list(self._iter_rows([models], value_paths))
+
+            key = self._get_keyset_field(querydict)
+            if key and models:
+                response['userdata'] = {'keyset': keyset.make_cursor(response['page'], key[0], key[1], models,
+                                                                     self._get_page_size(querydict),
+                                                                     self._get_keyset_query(querydict))}
+        finally:
+            recorder, self._recorder = self._recorder, None
+            if recorder is not None:
+                recorder.stop()
+        if recorder is not None:
+            self.query_audit.finish(self, recorder)
+        return response
+
+    def start_timing(self):
+        """
+        Starts timing the current request, if the grid has ``instrumentation``.
+
+        Returns:
+            The request's ``timing.Timings``, or ``None`` if the grid has no instrumentation
+        """
+        if self.instrumentation:
+            self._timings = self.instrumentation.start(self, connections[self.model.objects.db])
+        return self._timings
+
+    def timed(self, phase):
+        """
+        Returns a context manager that times a phase of the current request (see ``start_timing``). If the request is
+        not timed, the context manager does nothing.
+        """
+        if self._timings is None:
+            return timing.null_phase
+        return self._timings.phase(phase)
+
+    def audited(self, source):
+        """
+        Returns a context manager that attributes the queries of its block to a source, if the current request is
+        audited (see ``query_audit``). Otherwise the context manager does nothing.
+        """
+        if self._recorder is None:
+            return timing.null_phase
+        return self._recorder.source(source)
+
+    def get_export_columns(self, querydict):
+        """
+        Returns the columns of a CSV export.
+
+        The client can choose the columns with the ``columns`` query string parameter, a comma separated list of
+        column names, or export only the columns that are not hidden by passing ``visible=true``. Otherwise, all the
+        columns except client-only columns are exported.
+
+        Raises:
+            ValueError if ``columns`` contains a name that is not one of the grid's columns
+        """
+        spec = self.get_spec()
+        names = querydict.get('columns')
+        if names:
+            try:
+                return [spec.columns_by_name[name.strip().lower()] for name in names.split(',')]
+            except KeyError as e:
+                raise ValueError("Can't find export column '%s'" % e.args[0])
+        columns = [column for column in spec.column_list if not isinstance(column, ClientOnlyColumn)]
+        if querydict.get('visible') in ('1', 'true'):
+            columns = [column for column in columns if not column.model.get('hidden')]
+        return columns
+
+    def get_export_filename(self):
+        """
+        Returns the file name of the grid's CSV export. The default is the name of the grid's class.
+        """
+        return '%s.csv' % self.__class__.__name__
+
+    def iter_export_rows(self, querydict):
+        """
+        Returns the rows of a CSV export.
+
+        The export contains all the records of the grid's query (see ``_get_query_results``), with the request's
+        search and sort. The records are retrieved from the database ``export_chunk_size`` at a time, with a query
+        for each chunk, so only one chunk of records is in memory at a time. If the export is sorted by a
+        non-nullable field, the chunks are retrieved by seeking from the previous chunk, like keyset pagination, and
+        take the same time no matter how deep they are. Otherwise they are retrieved with ``OFFSET``.
+
+        Args:
+            querydict: The request's query dictionary
+        Returns:
+            An iterator of rows. The first row holds the titles of the exported columns (see ``get_export_columns``),
+            and each of the following rows holds the text of the columns of one record (see ``Column.render_text``).
+        """
+        columns = self.get_export_columns(querydict)
         queryset = self._get_query_results(querydict)
+        key = self._get_export_key(queryset, querydict)
+        if key:
+            sort_name, descending = key
+            sorder = '-' if descending else ''
+            order = [sorder + 'pk'] if sort_name == 'pk' else [sorder + sort_name, sorder + 'pk']
+            queryset = queryset.order_by(*order)
+        queryset = self._apply_annotations(queryset)
+        queryset, value_paths = self._apply_projection(queryset, (key[0], 'pk') if key else ())
+        if value_paths is not None:
+            paths = dict((column.name, path) for column, path in zip(self.get_spec().column_list, value_paths))
+            value_paths = [paths[column.name] for column in columns]
+        return self._iter_export_rows(columns, queryset, value_paths, key)
 
-        page = int(querydict.get('page', '1'))
-        rows = int(querydict.get('rows', self._options.get('rownum', 20)))
-        queryset = self._apply_sort(queryset, querydict)
+    def _get_export_key(self, queryset, querydict):
+        """
+        Returns the ``(sort_name, descending)`` the export's chunks are seeked by (see ``_iterate_in_chunks``), or
+        ``None`` if the export's order doesn't allow seeking - the sort name doesn't refer to a concrete field, or
+        the field can be NULL. Unsorted exports are ordered by the primary key, unless the queryset has an order of
+        its own.
+        """
+        sort_name, descending = self._get_sort(querydict)
+        if not sort_name:
+            if queryset.ordered:
+                return None
+            sort_name = 'pk'
+        fields = _get_path_fields(self.model, sort_name)
+        if fields is None or any(field.null for field in fields):
+            return None
+        return sort_name, descending
 
-        total_pages = (len(queryset) + rows - 1) / rows
-        paginator = Paginator(queryset, rows)
-        response = {'page': page,
-                    'total': total_pages,
-                    'records': len(queryset),
-                    'rows': [self._model_to_dict(m) for m in paginator.page(page)]}
-        return response
+    def _iter_export_rows(self, columns, queryset, value_paths, key):
+        yield [column.title for column in columns]
+        for models in _iterate_in_chunks(queryset, self.export_chunk_size, key):
+            if value_paths is not None:
+                for values in models:
+                    yield [column.render_value(values[path] if path else None)
+                           for column, path in zip(columns, value_paths)]
+            else:
+                for row in zip(*[column.render_texts(models) for column in columns]):
+                    yield list(row)
+
+    def is_streamed(self, querydict):
+        """
+        Returns True if the response to a request should be streamed - if its pages have at least ``stream_rows``
+        rows.
+
+        Grids that override ``get_json_data`` are never streamed, since ``iter_json_data`` would bypass the override,
+        and neither are grids with a ``query_audit``, since streamed responses can't be audited.
+        """
+        if self.stream_rows is None or self.query_audit or _is_overridden(self, BaseGrid, 'get_json_data'):
+            return False
+        return self._get_page_size(querydict) >= self.stream_rows
+
+    def iter_json_data(self, querydict):
+        """
+        Returns the grid's contents like ``get_json_data``, with the rows rendered as they are retrieved from the
+        database, in chunks of ``stream_chunk_size``. Each chunk is retrieved with a separate query (using
+        ``OFFSET`` within the page), so only one chunk of models is in memory at a time.
+
+        Streamed responses do not contain a ``keyset`` cursor, since the page's last row is not known until the rows
+        have been sent. The page after a streamed page is retrieved with ``OFFSET``.
+
+        Args:
+            querydict: The request's query dictionary
+        Returns:
+            A ``(response, rows)`` tuple. ``response`` is the response dictionary without ``rows``. ``rows`` is an
+            iterator of the row dictionaries.
+        """
+        response, models, value_paths = self._get_page_models(querydict)
+        if isinstance(models, QuerySet):
+            chunks = _iterate_in_chunks(models, self.stream_chunk_size)
+        else:
+            chunks = [models]
+        return response, self._iter_rows(chunks, value_paths)
     
 
 class Grid(six.with_metaclass(DeclarativeColumnsMetaclass, BaseGrid)):
@@ -1,4 +1,8 @@
 import json
+from json.encoder import encode_basestring_ascii
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six
 
 """
 This module contains helper methods to help put function names in the JSON that is used as the jqGrid's options
@@ -14,16 +18,21 @@ The jqGrid option object is actually a Python dictionary that is rendered to JSO
 Unfortunately, Python's ``json`` module can't output such JSON, it will always put quotes around strings (without the
 quotes, it's not legal JSON), so we need to work around it to support unquoted strings.
 
-The solution is simple and a bit ugly - we use a token that we wrap around function names. We serialize
-the dictionary to a JSON string, look for the token and remove the quotes around it.
+The solution is simple and a bit ugly - we use a token that we wrap around function names. When we serialize the
+dictionary, strings wrapped with the token are written without their quotes and the token.
 
 Our token is ``@@``. So in the example about, our Python dict will be: ``{'loadComplete': '@@loadCompleteHandler@@')``.
-When we create the JSON, we remove the quotes and the @@, and end up with the expected string.
+When we create the JSON, we drop the quotes and the @@, and end up with the expected string.
 
 The ``function`` helper function puts the token around the string, so that we can build our dictionary like so:
 ``d = {'loadComplete': function('loadCompleteHandler'))`` .
 
 Instead of using ``json.dumps`` we have our own ``dumps`` that unquotes function names.
+
+This module also chooses the JSON encoder grid responses are serialized with (``encode``). Serialization takes a
+large part of a grid request, so a faster encoder is used if one is installed - ``ujson``, then ``simplejson`` (with its
+C speedups), and finally the standard library's ``json``. The encoder can be chosen with the
+``DJQGRID_JSON_ENCODER`` setting, or with ``set_encoder``. See ``encode`` for the differences between the encoders.
 """
 
 token = '@@'
@@ -37,11 +46,11 @@ def function(funcname):
     Unfortunately, Python's ``json`` module can't output such JSON, it will always put quotes around strings (without the
     quotes, it's not legal JSON), so we need to work around it to support unquoted strings.
 
-    The solution is simple and a bit ugly - we use a token that we wrap around function names. We serialize
-    the dictionary to a JSON string, look for the token and remove the quotes around it.
+    The solution is simple and a bit ugly - we use a token that we wrap around function names. When we serialize the
+    dictionary, strings wrapped with the token are written without their quotes and the token.
 
     Our token is ``@@``. So in the example about, our Python dict will be: ``{'loadComplete': '@@loadCompleteHandler@@')``.
-    When we create the JSON, we remove the quotes and the @@, and end up with the expected string.
+    When we create the JSON, we drop the quotes and the @@, and end up with the expected string.
 
     The ``function`` helper function puts the token around the string, so that we can build our dictionary like so:
     ``d = {'loadComplete': function('loadCompleteHandler'))`` .
@@ -54,16 +63,135 @@ def function(funcname):
     """
     return token + funcname + token
 
-def dumps(o, *args, **kwargs):
+def _load_ujson():
+    import ujson
+    return ujson.dumps
+
+def _load_simplejson():
+    import simplejson
+    try:
+        from simplejson import _speedups
+    except ImportError:
+        raise ImportError('simplejson is installed without its C speedups')
+    # simplejson serializes Decimals by default, the standard library's json doesn't
+    return simplejson.JSONEncoder(use_decimal=False).encode
+
+def _load_json():
+    return json.JSONEncoder().encode
+
+# The available encoders, by preference
+encoders = (
+    ('ujson', _load_ujson),
+    ('simplejson', _load_simplejson),
+    ('json', _load_json),
+)
+
+_encoder = None
+
+def _load_encoder(name):
+    for encoder_name, load in encoders:
+        if encoder_name == name:
+            return name, load()
+    raise ValueError("Unknown JSON encoder '%s'" % name)
+
+def set_encoder(name=None):
+    """
+    Sets the JSON encoder ``encode`` uses.
+
+    Args:
+        name: The name of the encoder - ``'ujson'``, ``'simplejson'`` or ``'json'``. If ``None``, the fastest installed
+            encoder is used.
+    Raises:
+        ImportError if the encoder is not installed
+    """
+    global _encoder
+    if name:
+        _encoder = _load_encoder(name)
+        return
+    for encoder_name, load in encoders:
+        try:
+            _encoder = encoder_name, load()
+            return
+        except ImportError:
+            pass
+
+def get_encoder():
+    """
+    Returns the name of the JSON encoder ``encode`` uses, choosing it on first use.
+    """
+    if _encoder is None:
+        try:
+            name = getattr(settings, 'DJQGRID_JSON_ENCODER', None)
+        except ImproperlyConfigured:  # Not running in a Django project
+            name = None
+        set_encoder(name)
+    return _encoder[0]
+
+def encode(o):
+    """
+    Serializes an object to JSON with the current encoder (see ``get_encoder``).
+
+    Objects the encoder can't serialize (such as integers too large for ``ujson``) are serialized with the standard
+    library's ``json``. The encoders differ in one respect - ``ujson`` serializes ``Decimal`` values as floats
+    (``Decimal('1.10')`` becomes ``1.1``), while ``simplejson`` and ``json`` raise a ``TypeError``. Convert
+    Decimals to strings or floats yourself (in ``_get_additional_data``, for example) so that the response doesn't
+    depend on the installed encoder.
+    """
+    if _encoder is None:
+        get_encoder()
+    try:
+        return _encoder[1](o)
+    except (TypeError, OverflowError):
+        if _encoder[0] == 'json':
+            raise
+        return json.dumps(o)
+
+def _is_function(value):
+    return len(value) > 2 * len(token) and value.startswith(token) and value.endswith(token)
+
+# How values that aren't containers are serialized by the default ``json.dumps`` arguments
+_literals = {True: 'true', False: 'false', None: 'null'}
+
+def _dumps_key(key, kwargs):
+    if not isinstance(key, six.string_types):
+        key = json.dumps(key)   # This is how json.dumps converts numbers, booleans and None to keys
+    return json.dumps(key, **kwargs) if kwargs else encode_basestring_ascii(key)
+
+def _dumps(o, indent, level, kwargs):
+    if isinstance(o, six.string_types):
+        if _is_function(o):
+            return o[len(token):-len(token)]
+        return json.dumps(o, **kwargs) if kwargs else encode_basestring_ascii(o)
+    elif isinstance(o, dict):
+        items = [(_dumps_key(key, kwargs), value) for key, value in six.iteritems(o)]
+        if kwargs.get('sort_keys'):
+            items.sort()
+        parts = [key + ': ' + _dumps(value, indent, level + 1, kwargs) for key, value in items]
+        opening, closing = '{', '}'
+    elif isinstance(o, (list, tuple)):
+        parts = [_dumps(value, indent, level + 1, kwargs) for value in o]
+        opening, closing = '[', ']'
+    elif (o is None or isinstance(o, bool)) and not kwargs:
+        return _literals[o]
+    else:
+        return json.dumps(o, **kwargs)
+
+    if not parts:
+        return opening + closing
+    if indent is None:
+        return opening + ', '.join(parts) + closing
+    inner = '\n' + ' ' * (indent * (level + 1))
+    return opening + inner + (',' + inner).join(parts) + '\n' + ' ' * (indent * level) + closing
+
+def dumps(o, indent=None, **kwargs):
     """
     Serializes an object to JSON, unquoting function names.
 
+    The object is serialized in a single pass - function names are written as they are encountered.
+
     Args:
         o: Object to serialize
-        *args: Additional arguments passed to ``json.dumps``
+        indent: Indentation of nested objects and lists, as in ``json.dumps``
         **kwargs: Additional arguments passed to ``json.dumps``
     """
-    s = json.dumps(o, *args, **kwargs)
-    s = s.replace('"' + token, '')
-    s = s.replace(token + '"', '')
-    return s
+    return _dumps(o, indent, 0, kwargs)
@@ -0,0 +1,164 @@
+"""
+This module implements keyset (seek) pagination for grids.
+
+With regular pagination, page N is retrieved with ``OFFSET (N-1)*rows``, and the database has to scan and throw away
+all the rows of the previous pages. The deeper the page, the slower the query.
+
+Keyset pagination uses the rows of the page the client currently displays instead. The grid is ordered by its sort
+field, with the primary key as a tie-breaker, so every row has a unique *key* - its ``(sort value, pk)`` pair. The
+next page is the ``rows`` rows whose keys come after the key of the current page's last row, and the previous page
+is the ``rows`` rows whose keys come before the key of the current page's first row. Both are indexed lookups that take
+the same time regardless of the page's number.
+
+The server sends the keys of each page's first and last rows to the client in the response's ``userdata``, in what
+we call a *cursor*. The client sends the cursor back with its next request (this is done by
+``keysetSerializeGridData`` in ``djqgrid_utils.js``). If the client asks for the page right after or right before the
+cursor's page, the page is retrieved by seeking. Any other page (the pager's first and last page buttons, or a page
+number typed by the user) is retrieved with ``OFFSET``.
+
+The cursor also holds the page size and a hash of the rest of the query (the search and any other parameters), so a
+cursor is only used with the query it was created for - after the user changes the search or the page size, the
+requested page is retrieved with ``OFFSET``. Sort fields that can be NULL (including fields reached through nullable
+foreign keys) are not seeked, since NULLs can't be compared.
+"""
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import six
+
+__author__ = 'zmbq'
+
+def get_path_value(row, path):
+    """
+    Returns the value of a query path (``customer__name``) in a row.
+
+    Args:
+        row: A model instance, or a dictionary retrieved with ``values``
+        path: The query path
+    """
+    if isinstance(row, dict):
+        return row[path]
+    for name in path.split('__'):
+        row = getattr(row, name)
+        if row is None:
+            break
+    return row
+
+def _to_json_value(value):
+    """
+    Converts a key value to a value that can be sent in JSON. Values that aren't numbers are sent as strings, and are
+    converted back with the field's ``to_python``.
+    """
+    if value is None or isinstance(value, six.integer_types + (float,)):
+        return value
+    return six.text_type(value)
+
+def make_cursor(page, sort_name, descending, rows, page_size, query):
+    """
+    Creates the cursor of a page.
+
+    Args:
+        page: The page number
+        sort_name: The sort name the page is ordered by
+        descending: True if the page is ordered in descending order
+        rows: The page's rows - model instances or ``values`` dictionaries. Must not be empty. The rows must contain
+            ``sort_name`` and ``pk``.
+        page_size: Number of rows in a page
+        query: A string that identifies the rest of the page's query, such as a hash of its search
+    Returns:
+        A dictionary that can be sent to the client.
+    """
+    def key(row):
+        return [_to_json_value(get_path_value(row, sort_name)), _to_json_value(get_path_value(row, 'pk'))]
+
+    return {'page': page,
+            'sort': sort_name,
+            'desc': descending,
+            'rows': page_size,
+            'query': query,
+            'first': key(rows[0]),
+            'last': key(rows[-1])}
+
+def parse_cursor(s):
+    """
+    Parses a cursor sent back by the client.
+
+    Returns:
+        The cursor's dictionary, or ``None`` if the cursor is missing or malformed.
+    """
+    if not s:
+        return None
+    try:
+        cursor = json.loads(s)
+        if (isinstance(cursor, dict) and isinstance(cursor['page'], six.integer_types) and
+                'sort' in cursor and 'desc' in cursor and 'rows' in cursor and 'query' in cursor and
+                len(cursor['first']) == 2 and len(cursor['last']) == 2):
+            return cursor
+    except (ValueError, TypeError, KeyError):
+        pass
+    return None
+
+def filter_beyond(queryset, sort_name, descending, value, pk, forward=True):
+    """
+    Filters a queryset to the rows whose keys come after a key, or before it.
+
+    Args:
+        queryset: A queryset ordered by ``sort_name`` and then the primary key
+        sort_name: The sort name of the queryset's order
+        descending: True if the queryset is ordered in descending order
+        value: The key's ``sort_name`` value. Must not be ``None``
+        pk: The key's primary key
+        forward: True for the rows after the key, False for the rows before it
+    Returns:
+        The filtered queryset, in the same order
+    """
+    lookup = 'gt' if forward != descending else 'lt'
+    if sort_name == 'pk':
+        return queryset.filter(**{'pk__' + lookup: pk})
+    return queryset.filter(Q(**{sort_name + '__' + lookup: value}) |
+                           Q(**{sort_name: value, 'pk__' + lookup: pk}))
+
+def seek(queryset, cursor, field, sort_name, descending, page, rows, query):
+    """
+    Retrieves a page adjacent to the cursor's page.
+
+    Args:
+        queryset: The grid's queryset, ordered by ``sort_name`` and then the primary key
+        cursor: The cursor sent by the client
+        field: The model field ``sort_name`` refers to, used to convert the cursor's values
+        sort_name: The sort name of the grid's order
+        descending: True if the grid is ordered in descending order
+        page: The requested page number
+        rows: Number of rows in a page
+        query: The string that identifies the rest of the query, as passed to ``make_cursor``
+    Returns:
+        The page's rows, or ``None`` if the page can't be retrieved by seeking - because it isn't adjacent to the
+        cursor's page, because the order, the page size or the query have changed, or because the cursor's key can't
+        be used.
+    """
+    if cursor['sort'] != sort_name or cursor['desc'] != descending:
+        return None
+    if cursor['rows'] != rows or cursor['query'] != query:
+        return None
+    if page == cursor['page'] + 1:
+        (value, pk), forward = cursor['last'], True
+    elif page == cursor['page'] - 1:
+        (value, pk), forward = cursor['first'], False
+    else:
+        return None
+    if value is None or pk is None:
+        return None  # NULLs can't be compared, let OFFSET handle this
+    try:
+        value = field.to_python(value)
+        pk = queryset.model._meta.pk.to_python(pk)
+    except (ValidationError, ValueError, TypeError):
+        return None
+
+    queryset = filter_beyond(queryset, sort_name, descending, value, pk, forward)
+    if forward:
+        return list(queryset[:rows])
+
+    # Going backwards, retrieve the rows closest to the cursor in reverse order, and put them back in order
+    result = list(queryset.reverse()[:rows])
+    result.reverse()
+    return result
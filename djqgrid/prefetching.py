@@ -0,0 +1,128 @@
+"""
+This module prefetches the pages users are likely to request next.
+
+Users mostly page through grids sequentially. Setting a grid's ``page_prefetch`` attribute makes the ``query`` view
+render the next page (and optionally the previous one) in a background thread after it responds, and store it in the
+grid's ``response_cache``, so the next click is served from the cache::
+
+    class MyGrid(Grid):
+        model = MyModel
+        response_cache = ResponseCache(timeout=300)
+        page_prefetch = PagePrefetcher(max_workers=2)
+
+Prefetching never delays a response, and can't amplify the load on a busy server - each process runs at most
+``max_workers`` prefetches at a time, and pages that would need more are simply not prefetched. Pages that are already
+cached, or are being prefetched, are skipped.
+
+Prefetching requires a ``response_cache``. The cache should be shared between the processes that serve the grid,
+otherwise the next request may reach a process that didn't prefetch the page.
+"""
+import logging
+import threading
+from django.db import connections
+from json_helpers import encode
+
+__author__ = 'zmbq'
+
+logger = logging.getLogger('djqgrid.prefetching')
+
+class PagePrefetcher(object):
+    """
+    Prefetches the pages adjacent to the pages a grid serves into its ``response_cache``.
+
+    Attributes:
+        started: Number of prefetches this process started
+        dropped: Number of prefetches this process skipped because ``max_workers`` prefetches were running
+    """
+    def __init__(self, max_workers=2, previous=False):
+        """
+        Initializes a PagePrefetcher
+
+        Args:
+            max_workers: The maximal number of prefetches that run at the same time in a process
+            previous: If True, the previous page is prefetched as well as the next page
+        """
+        self._workers = threading.BoundedSemaphore(max_workers)
+        self._previous = previous
+        self._lock = threading.Lock()
+        self._running = set()  # Cache keys of the pages being prefetched
+        self.started = 0
+        self.dropped = 0
+
+    def get_pages(self, querydict, total=None):
+        """
+        Returns the numbers of the pages to prefetch after a request.
+
+        Args:
+            querydict: The request's query dictionary
+            total: The number of pages in the response to the request. Pages beyond it are not prefetched.
+        """
+        try:
+            page = int(querydict.get('page', '1'))
+        except (TypeError, ValueError):
+            return []
+        pages = []
+        if total is None or page < total:
+            pages.append(page + 1)
+        if self._previous and page > 1 and (total is None or page - 1 <= total):
+            pages.append(page - 1)
+        return pages
+
+    def schedule(self, grid, querydict, total=None):
+        """
+        Starts prefetching the pages adjacent to a request's page, unless they're cached or being prefetched.
+
+        Args:
+            grid: The grid that served the request
+            querydict: The request's query dictionary
+            total: The number of pages in the response to the request (its ``total``). Pages beyond it are not
+                prefetched.
+        """
+        cache = grid.response_cache
+        for page in self.get_pages(querydict, total):
+            page_querydict = querydict.copy()
+            page_querydict['page'] = str(page)
+            page_querydict.pop('keyset', None)  # The keyset cursor belongs to the request's page
+            key = cache.get_key(grid, page_querydict)
+            if cache.contains(key):
+                continue
+            with self._lock:
+                if key in self._running:
+                    continue
+                if not self._workers.acquire(False):
+                    self.dropped += 1
+                    return
+                self._running.add(key)
+                self.started += 1
+            self._start(grid.__class__, page_querydict, key)
+
+    def _start(self, gridcls, querydict, key):
+        """
+        Runs a prefetch in a background thread.
+        """
+        thread = threading.Thread(target=self._run, args=(gridcls, querydict, key))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, gridcls, querydict, key):
+        try:
+            self._prefetch(gridcls, querydict, key)
+        finally:
+            # Each thread has its own database connections, which Django only closes for request threads
+            for connection in connections.all():
+                connection.close()
+
+    def _prefetch(self, gridcls, querydict, key):
+        """
+        Renders a page and stores it in the grid's cache, the way the ``query`` view does.
+        """
+        try:
+            grid = gridcls()
+            data = grid.get_json_data(querydict)
+            grid.response_cache.set(key, encode(data), data['total'])
+        except Exception:
+            logger.exception('Prefetching a page of %s failed', gridcls.__name__)
+        finally:
+            with self._lock:
+                self._running.discard(key)
+            self._workers.release()
@@ -2,11 +2,129 @@
  * Created by zmbq on 6/4/14.
  */
 
+function getRowExtra(rowObject) {
+    // Returns the dictionary at the end of a compact row (see the Grid's compact_rows attribute), which holds the
+    // html of cells whose HTML differs from their text, and the row's additional data.
+    if ($.isArray(rowObject)) {
+        var last = rowObject[rowObject.length - 1];
+        return $.isPlainObject(last) ? last : {};
+    }
+    return rowObject;
+}
+
+function getRowAdditionalData(rowObject) {
+    // Returns the additional data of a row, in both row formats
+    return getRowExtra(rowObject).additional;
+}
+
 function customHtmlFormatter(cellValue, options, rowObject) {
     var col = options.colModel.name
-    var html = rowObject.html[col]
+    var html = getRowExtra(rowObject).html
+
+    if ($.isArray(rowObject)) {
+        return (html && html[col]) || cellValue
+    }
+    return (html && html[col]) || rowObject[col]
+}
+
+function keysetSerializeGridData(postData) {
+    // Sends the keyset cursor of the displayed page back to the server, so that the next and previous pages
+    // can be retrieved by seeking instead of with OFFSET. Used as the serializeGridData option of keyset grids.
+    var userData = $(this).jqGrid('getGridParam', 'userData');
+    if (userData && userData.keyset) {
+        postData.keyset = JSON.stringify(userData.keyset);
+    }
+    return postData;
+}
+
+function exportGrid(grid, visibleOnly) {
+    // Downloads the rows of a grid as a CSV file, with the grid's current search and sort. The grid must have
+    // csv_export set. If visibleOnly is true, only the columns that are not hidden are exported.
+    var $grid = $(grid);
+    var postData = $grid.jqGrid('getGridParam', 'postData');
+    var params = {};
+    $.each(['_search', 'filters', 'searchField', 'searchOper', 'searchString', 'sidx', 'sord'], function (i, name) {
+        if (postData[name] !== undefined && postData[name] !== null) {
+            params[name] = postData[name];
+        }
+    });
+    if (visibleOnly) {
+        var names = [];
+        $.each($grid.jqGrid('getGridParam', 'colModel'), function (i, col) {
+            if (!col.hidden && col.name !== 'rn' && col.name !== 'cb' && col.name !== 'subgrid') {
+                names.push(col.name);
+            }
+        });
+        params.columns = names.join(',');
+    }
+    window.location = $grid.jqGrid('getGridParam', 'exportUrl') + '?' + $.param(params);
+}
+
+function loadGridData(grid, data) {
+    // Fills a grid with data retrieved from the server, like a load of the json datatype
+    grid.addJSONData(data);
+    $(grid).triggerHandler('jqGridLoadComplete', [data]);
+    if ($.isFunction(grid.p.loadComplete)) {
+        grid.p.loadComplete.call(grid, data);
+    }
+}
+
+function inlineDatatype(postData) {
+    // The datatype of grids created by the jqgrid template tag with inline=True. The first page was rendered into
+    // the HTML, so the first load uses it. The grid then switches to the json datatype for its following loads.
+    var $grid = $(this);
+    var data = $grid.data('djqgridInline');
+    $grid.removeData('djqgridInline');
+    $grid.jqGrid('setGridParam', {datatype: 'json'});
+    loadGridData(this, data);
+}
+
+// The first loads of batch grids waiting to be sent to the server, see batchDatatype
+var pendingBatchLoads = [];
+
+function batchDatatype(postData) {
+    // The datatype of grids created by the jqgrid template tag with batch=True. The first load of each such grid is
+    // queued, and all the loads queued while the page is set up are sent to the server in one request. The grid then
+    // switches to the json datatype, so its following loads are regular requests.
+    var grid = this;
+    var data = $.isFunction(grid.p.serializeGridData) ? grid.p.serializeGridData.call(grid, postData) : postData;
+    var query = grid.p.url.split('?')[1] || '';
+    var serialized = typeof data === 'string' ? data : $.param(data);
+    if (serialized) {
+        query += (query ? '&' : '') + serialized;
+    }
+    $(grid).jqGrid('setGridParam', {datatype: 'json'});
+
+    pendingBatchLoads.push({grid: grid, gridId: grid.p.batchGridId, query: query, url: grid.p.batchUrl});
+    if (pendingBatchLoads.length === 1) {
+        setTimeout(sendBatchLoads, 0);
+    }
+}
 
-    return html || rowObject[col]
+function sendBatchLoads() {
+    var loads = pendingBatchLoads;
+    pendingBatchLoads = [];
+    $.ajax({
+        url: loads[0].url,
+        data: {requests: JSON.stringify($.map(loads, function (load) { return [[load.gridId, load.query]]; }))},
+        dataType: 'json',
+        success: function (results) {
+            $.each(loads, function (i, load) {
+                if (results[i]) {
+                    loadGridData(load.grid, results[i]);
+                } else {
+                    // The page is too large for a batch, load it on its own
+                    $(load.grid).trigger('reloadGrid');
+                }
+            });
+        },
+        error: function () {
+            // Load each grid on its own
+            $.each(loads, function (i, load) {
+                $(load.grid).trigger('reloadGrid');
+            });
+        }
+    });
 }
 
 function getGridRowElement(grid, rowId) {
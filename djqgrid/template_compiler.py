@@ -0,0 +1,138 @@
+"""
+This module speeds up the rendering of ``TemplateColumn`` cells.
+
+Rendering a Django template for every cell of a grid is expensive. On top of the template rendering itself, the HTML
+has to be flattened into a single line (jqGrid has issues with multiline cell values), which means splitting it into
+lines, stripping each line and joining the lines back together.
+
+Most column templates are *simple* - they consist of nothing but text and variables (``{{ model.name|upper }}``).
+``compile_template`` turns such templates into a ``CompiledTemplate``, which renders the variables exactly as the
+template would, and has its text flattened once, when it is compiled, instead of on every cell.
+"""
+import string
+from django.template.base import TextNode, VariableNode, render_value_in_context
+from django.utils import six
+
+__author__ = 'zmbq'
+
+def flatten(html):
+    """
+    Flattens HTML into a single line, by stripping all the lines and joining them with spaces.
+    """
+    lines = html.split('\n')
+    lines = [line.strip() for line in lines]
+    return string.join(lines)
+
+def render_value(value, context):
+    """
+    Converts a value to the string a template would render it as, escaping it if required.
+
+    This is ``render_value_in_context``, with a shortcut for plain strings, which are the most common values.
+    """
+    if type(value) is six.binary_type:
+        value = value.decode('utf-8')
+    if type(value) is six.text_type:
+        if not context.autoescape:
+            return value
+        # This is what django.utils.html.escape does
+        return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
+    return render_value_in_context(value, context)
+
+def _render_variable(filter_expression, context):
+    # This is what VariableNode.render does
+    try:
+        output = filter_expression.resolve(context)
+    except UnicodeDecodeError:
+        return ''
+    return render_value(output, context)
+
+class CompiledTemplate(object):
+    """
+    A simple template, compiled for fast rendering.
+
+    The template is kept as a list of texts and variables - ``texts[0], variables[0], texts[1], ..., texts[-1]``.
+    The texts are flattened in advance. When a line of the template starts or ends with a variable, flattening the
+    rendered template strips the variable's value - this is noted in ``lstrip`` and ``rstrip``.
+
+    Flattening in advance gives the same result as flattening the rendered template, as long as the values don't
+    contain newlines, and values that are stripped don't consist of whitespace alone (stripping would continue into the
+    surrounding text). Values that break these conditions are rare, and are handled by rendering the raw template and
+    flattening it.
+    """
+    def __init__(self, texts, variables):
+        self._raw_texts = texts
+        self._variables = variables
+        self._texts = []
+        self._lstrip = [False] * len(variables)
+        self._rstrip = [False] * len(variables)
+
+        last = len(texts) - 1
+        for i, text in enumerate(texts):
+            lines = text.split('\n')
+            if len(lines) > 1:
+                # The template's first line is left stripped, its last line is right stripped
+                first_line = lines[0].strip() if i == 0 else lines[0].rstrip()
+                last_line = lines[-1].strip() if i == last else lines[-1].lstrip()
+                self._texts.append(' '.join([first_line] + [line.strip() for line in lines[1:-1]] + [last_line]))
+                ends_line = starts_line = True
+            else:
+                text = text.lstrip() if i == 0 else text
+                text = text.rstrip() if i == last else text
+                self._texts.append(text)
+                first_line = last_line = text
+                ends_line, starts_line = i == last, i == 0
+
+            # A line that ends right after variable i-1 strips it, and so does a line that starts with variable i
+            if i > 0 and ends_line and not first_line:
+                self._rstrip[i - 1] = True
+            if i < last and starts_line and not last_line:
+                self._lstrip[i] = True
+
+    def render(self, context):
+        """
+        Renders the template in a context, and returns the flattened HTML.
+        """
+        values = [_render_variable(variable, context) for variable in self._variables]
+        parts = [self._texts[0]]
+        for i, value in enumerate(values):
+            if '\n' in value:
+                return self._render_raw(values)
+            if self._lstrip[i] or self._rstrip[i]:
+                if not value.strip():
+                    return self._render_raw(values)
+                if self._lstrip[i]:
+                    value = value.lstrip()
+                if self._rstrip[i]:
+                    value = value.rstrip()
+            parts.append(value)
+            parts.append(self._texts[i + 1])
+        return ''.join(parts)
+
+    def _render_raw(self, values):
+        parts = [self._raw_texts[0]]
+        for i, value in enumerate(values):
+            parts.append(value)
+            parts.append(self._raw_texts[i + 1])
+        return flatten(''.join(parts))
+
+def compile_template(template):
+    """
+    Compiles a simple template.
+
+    Args:
+        template: A Django template
+    Returns:
+        A ``CompiledTemplate``, or ``None`` if the template is not simple - if it contains anything but text and
+        variables.
+    """
+    texts = ['']
+    variables = []
+    for node in getattr(template, 'nodelist', [None]):
+        if isinstance(node, TextNode):
+            texts[-1] += node.s
+        elif isinstance(node, VariableNode):
+            variables.append(node.filter_expression)
+            texts.append('')
+        else:
+            return None
+    return CompiledTemplate(texts, variables)
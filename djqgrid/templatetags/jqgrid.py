@@ -1,11 +1,13 @@
 # coding=utf-8
 from django import template
-from djqgrid import json_helpers
+from django.core.urlresolvers import reverse
+from django.http import QueryDict
+from djqgrid import json_helpers, views
 
 register = template.Library()
 
 @register.simple_tag(takes_context=True)
-def jqgrid(context, grid, prefix='', pager=True, urlquery=None, **kwargs):
+def jqgrid(context, grid, prefix='', pager=True, urlquery=None, batch=False, inline=False, **kwargs):
     """
     Adds a complete jqGrid - HTML and JavaScript - to the template.
 
@@ -25,6 +27,13 @@ def jqgrid(context, grid, prefix='', pager=True, urlquery=None, **kwargs):
             and ``prefix-pager``.
         pager - True if a pager is added to the grid. If no pager is added, the row count is set to 99,999.
         urlquery - An additional query string that will be added to the data request that will be sent to the server.
+        batch - If True, the grid's first page is retrieved in one request with the first pages of the page's other
+            ``batch`` grids (see ``views.batch``). The following pages are retrieved as usual, and so are first
+            pages that are large enough to be streamed.
+        inline - If True, the grid's first page is retrieved while the template is rendered, and embedded in the
+            generated script, saving the browser a request. The following pages are retrieved as usual. Pages that
+            are large enough to be streamed (see ``Grid.is_streamed``), such as the pages of grids without a pager,
+            are not embedded, and are retrieved as usual as well.
         **kwargs - All additional arguments are added as is to the jqGrid initialization option object.
 
     Returns:
@@ -46,6 +55,19 @@ def jqgrid(context, grid, prefix='', pager=True, urlquery=None, **kwargs):
         options['pager'] = '#' + pagerId
     else:
         options['rowNum'] = 99999
+    inline_data = ''
+    querydict = _get_first_querydict(options)
+    streamed = grid.is_streamed(querydict)
+    if inline and not streamed:
+        options['datatype'] = json_helpers.function('inlineDatatype')
+        content = views.get_grid_content(grid, querydict)
+        # The content is inside a <script>, which must not be closed by the text of the rows. '<' only appears in
+        # JSON strings, where it can be escaped.
+        inline_data = "$('#%s').data('djqgridInline', %s);\n            " % (gridId, content.replace('<', '\\u003c'))
+    elif batch and not streamed:
+        options['datatype'] = json_helpers.function('batchDatatype')
+        options['batchGridId'] = grid.get_grid_id()
+        options['batchUrl'] = reverse(views.batch)
     options = json_helpers.dumps(options, indent=4)
 
     html = """
@@ -53,8 +75,22 @@ def jqgrid(context, grid, prefix='', pager=True, urlquery=None, **kwargs):
     <div id="%s"></div>
     <script type="text/javascript">
         $(function() {
-            $('#%s').jqGrid(%s);
+            %s$('#%s').jqGrid(%s);
         });
-    </script>""" % (gridId, pagerId, gridId, options);
+    </script>""" % (gridId, pagerId, inline_data, gridId, options);
 
     return html
+
+def _get_first_querydict(options):
+    """
+    Returns the query dictionary of the first request jqGrid sends with the grid's options.
+    """
+    querydict = QueryDict(options['url'].split('?', 1)[1], mutable=True)
+    for key, value in (options.get('postData') or {}).items():
+        querydict[key] = value
+    querydict['_search'] = 'false'
+    querydict['page'] = str(options.get('page', 1))
+    querydict['rows'] = str(options.get('rowNum', 20))
+    querydict['sidx'] = options.get('sortname', '')
+    querydict['sord'] = options.get('sortorder', 'asc')
+    return querydict
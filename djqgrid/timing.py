@@ -0,0 +1,231 @@
+"""
+This module measures where the time of grid requests goes.
+
+``get_json_data`` does a lot - it builds the query, counts the records, retrieves the page, renders the columns,
+collects the additional data, and the response is then serialized. When a grid is slow, it's hard to tell which of
+these is to blame. Setting a grid's ``instrumentation`` attribute makes the ``query`` view time each of these
+*phases*::
+
+    class MyGrid(Grid):
+        model = MyModel
+        instrumentation = Instrumentation(sinks=[LoggingSink()], server_timing=True)
+
+The phases are:
+
+- ``query`` - building the queryset (``_get_query_results``), including searching and sorting
+- ``count`` - counting the records
+- ``page`` - retrieving the page's rows from the database
+- ``render`` - converting the rows to dictionaries, which includes the following phases:
+- ``column.<Class>`` - rendering the cells of the columns of each column class
+- ``additional`` - ``_get_additional_data_bulk``, which calls ``_get_additional_data`` by default
+- ``cache`` - looking up and storing the response in the ``response_cache``
+- ``encode`` - serializing the response to JSON
+- ``compress`` - compressing the response
+- ``total`` - the entire request
+
+Each phase records its wall time, and the number of SQL queries it ran. The timings of each request are passed to
+the instrumentation's *sinks* - ``LoggingSink`` logs them, and ``CallbackSink`` calls a function with each phase's
+duration, which is how they are sent to statsd-like collectors. If ``server_timing`` is set, the timings are also
+sent to the browser in a ``Server-Timing`` header, and can be seen in its developer tools. Streamed responses don't
+have a ``Server-Timing`` header, since their headers are sent before the rows are rendered.
+
+Grids without instrumentation pay nothing but a few attribute checks per request.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from django.utils.datastructures import SortedDict
+
+__author__ = 'zmbq'
+
+class _NullPhase(object):
+    """ The phase returned when timing is off. It does nothing. """
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+null_phase = _NullPhase()
+
+class Timings(object):
+    """
+    The timings of one request.
+
+    Attributes:
+        grid_name: The name of the grid's class
+        phases: A ``SortedDict`` mapping each phase to a ``[seconds, queries]`` list, in the order the phases started
+    """
+    def __init__(self, grid_name, connection=None):
+        """
+        Initializes a Timings
+
+        Args:
+            grid_name: The name of the grid's class
+            connection: The database connection whose queries are counted, or ``None`` if queries are not counted
+        """
+        self.grid_name = grid_name
+        self.phases = SortedDict()
+        self._connection = connection
+        self._use_debug_cursor = None
+        if connection is not None:
+            # Queries are only recorded by the debug cursor
+            self._use_debug_cursor = connection.use_debug_cursor
+            connection.use_debug_cursor = True
+        self._start = time.time()
+        self._start_queries = self._count_queries()
+
+    def _count_queries(self):
+        return len(self._connection.queries) if self._connection is not None else 0
+
+    def add(self, name, seconds, queries=0):
+        """
+        Adds time and queries to a phase.
+        """
+        phase = self.phases.get(name)
+        if phase is None:
+            self.phases[name] = [seconds, queries]
+        else:
+            phase[0] += seconds
+            phase[1] += queries
+
+    @contextmanager
+    def phase(self, name):
+        """
+        A context manager that adds the time and queries of its block to a phase.
+        """
+        start = time.time()
+        start_queries = self._count_queries()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start, self._count_queries() - start_queries)
+
+    def call(self, name, func, *args):
+        """
+        Calls a function, adding its time and queries to a phase, and returns its result.
+        """
+        with self.phase(name):
+            return func(*args)
+
+    def finish(self):
+        """
+        Ends the request's timing, recording the ``total`` phase.
+        """
+        self.add('total', time.time() - self._start, self._count_queries() - self._start_queries)
+        if self._connection is not None:
+            self._connection.use_debug_cursor = self._use_debug_cursor
+            self._connection = None
+
+    def get_server_timing(self):
+        """
+        Returns the value of the ``Server-Timing`` header of the timings.
+        """
+        metrics = []
+        for name, (seconds, queries) in self.phases.items():
+            metric = '%s;dur=%.3f' % (name, seconds * 1000)
+            if queries:
+                metric += ';desc="%d queries"' % queries
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+class LoggingSink(object):
+    """
+    Logs the timings of each request in one line.
+    """
+    def __init__(self, logger='djqgrid.timing', level=logging.INFO):
+        """
+        Initializes a LoggingSink
+
+        Args:
+            logger: The name of the logger
+            level: The level of the log messages
+        """
+        self._logger = logging.getLogger(logger)
+        self._level = level
+
+    def __call__(self, timings):
+        self._logger.log(self._level, '%s %s', timings.grid_name,
+                         ' '.join('%s=%.3fms/%dq' % (name, seconds * 1000, queries)
+                                  for name, (seconds, queries) in timings.phases.items()))
+
+class CallbackSink(object):
+    """
+    Calls a function with the duration of each phase, such as a statsd client's ``timing`` method.
+    """
+    def __init__(self, callback, prefix='djqgrid'):
+        """
+        Initializes a CallbackSink
+
+        Args:
+            callback: A function that takes a metric name (``djqgrid.MyGrid.count``) and a duration in milliseconds
+            prefix: The prefix of the metric names
+        """
+        self._callback = callback
+        self._prefix = prefix
+
+    def __call__(self, timings):
+        for name, (seconds, queries) in timings.phases.items():
+            self._callback('%s.%s.%s' % (self._prefix, timings.grid_name, name), seconds * 1000)
+
+class Instrumentation(object):
+    """
+    Times the requests of a grid.
+    """
+    def __init__(self, sinks=(), server_timing=False, count_queries=True):
+        """
+        Initializes an Instrumentation
+
+        Args:
+            sinks: Functions that are called with the ``Timings`` of each request, such as ``LoggingSink`` and
+                ``CallbackSink``
+            server_timing: If True, the timings are sent to the client in a ``Server-Timing`` header
+            count_queries: If True, the SQL queries of each phase are counted. This turns on Django's debug cursor
+                during the request, which records the SQL of each query.
+        """
+        self._sinks = sinks
+        self._server_timing = server_timing
+        self._count_queries = count_queries
+
+    def start(self, grid, connection):
+        """
+        Starts timing a request.
+
+        Args:
+            grid: The grid
+            connection: The database connection of the grid's model
+        Returns:
+            The request's ``Timings``
+        """
+        return Timings(grid.__class__.__name__, connection if self._count_queries else None)
+
+    def finish(self, timings, response):
+        """
+        Finishes timing a request, and reports the timings.
+
+        The timings of a streamed response are reported when the response has been streamed.
+
+        Returns:
+            The response
+        """
+        if response.streaming:
+            response.streaming_content = self._finish_streaming(timings, response.streaming_content)
+            return response
+
+        timings.finish()
+        if self._server_timing:
+            response['Server-Timing'] = timings.get_server_timing()
+        self._report(timings)
+        return response
+
+    def _finish_streaming(self, timings, content):
+        try:
+            for chunk in content:
+                yield chunk
+        finally:
+            timings.finish()
+            self._report(timings)
+
+    def _report(self, timings):
+        for sink in self._sinks:
+            sink(timings)
@@ -2,4 +2,6 @@ from django.conf.urls import patterns, include, url
 import views
 
 urlpatterns = patterns('djqgrid',
-    (r'query/(?P<grid_id>\w+)$', views.query),)
+    (r'query/(?P<grid_id>\w+)$', views.query),
+    (r'export/(?P<grid_id>\w+)$', views.export),
+    (r'batch$', views.batch),)
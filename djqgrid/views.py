@@ -1,12 +1,19 @@
+import calendar
+import csv
 import json
-from django.http import HttpResponse
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, QueryDict,
+                         StreamingHttpResponse)
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from compression import strip_etag
 from grid_registrar import get_grid_class
+from json_helpers import encode
 
 class JsonResponse(HttpResponse):
     """
     Returns a JSON Response
 
-    Takes the content object, json.dumps it and returns it an a response.
+    Takes the content object, serializes it with ``json_helpers.encode`` and returns it an a response.
 
     Args:
         content: The object to be serialized into JSON
@@ -18,11 +25,113 @@ class JsonResponse(HttpResponse):
     """
     def __init__(self, content, status=None, content_type='application/json'):
         super(JsonResponse, self).__init__(
-            content=json.dumps(content),
+            content=encode(content),
             status=status,
             content_type=content_type)
 
 
+class StreamingJsonResponse(StreamingHttpResponse):
+    """
+    Streams a JSON response with a list of rows
+
+    The content is identical to the content of a ``JsonResponse`` of the same object, but the rows are serialized
+    one by one, as they are produced.
+
+    Args:
+        content: The object to be serialized into JSON, without its rows
+        rows: An iterator of the rows
+        rows_name: The name of the rows in the object. Default is ``rows``
+        chunk_size: Number of rows sent to the client at a time. Default is 100
+        status: HTTP status code. Default is NONE.
+        content_type: The response content type. Default is application/json
+    Returns:
+        A Django response object
+    """
+    _rows_token = '@@djqgrid-rows@@'
+
+    def __init__(self, content, rows, rows_name='rows', chunk_size=100, status=None,
+                 content_type='application/json'):
+        super(StreamingJsonResponse, self).__init__(
+            streaming_content=self._serialize(content, rows, rows_name, chunk_size),
+            status=status,
+            content_type=content_type)
+
+    def _serialize(self, content, rows, rows_name, chunk_size):
+        content = dict(content)
+        content[rows_name] = self._rows_token
+        head, tail = encode(content).split(encode(self._rows_token), 1)
+        row_separator = encode([0, 0])[2:-2]    # Encoders differ in their separators
+
+        chunk = [head + '[']
+        separator = ''
+        for row in rows:
+            chunk.append(separator + encode(row))
+            separator = row_separator
+            if len(chunk) >= chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append(']' + tail)
+        yield ''.join(chunk)
+
+class _RowBuffer(object):
+    """ A file-like object that keeps what the ``csv`` module writes to it """
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+class StreamingCsvResponse(StreamingHttpResponse):
+    """
+    Streams a CSV response, encoded in UTF-8
+
+    The rows are serialized as they are produced, so if they are produced lazily, the whole response is never held
+    in memory.
+
+    Args:
+        rows: An iterator of rows, each row being a list of values
+        filename: The name of the file the browser saves the response to, or ``None``
+        chunk_size: Number of rows sent to the client at a time. Default is 1000
+        status: HTTP status code. Default is NONE.
+        content_type: The response content type. Default is text/csv
+    Returns:
+        A Django response object
+    """
+    def __init__(self, rows, filename=None, chunk_size=1000, status=None, content_type='text/csv; charset=utf-8'):
+        super(StreamingCsvResponse, self).__init__(
+            streaming_content=self._serialize(rows, chunk_size),
+            status=status,
+            content_type=content_type)
+        if filename:
+            self['Content-Disposition'] = 'attachment; filename="%s"' % filename
+
+    def _serialize(self, rows, chunk_size):
+        buffer = _RowBuffer()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([value.encode('utf-8') if isinstance(value, unicode) else value for value in row])
+            if len(buffer.lines) >= chunk_size:
+                yield ''.join(buffer.lines)
+                buffer.lines = []
+        yield ''.join(buffer.lines)
+
+def _is_not_modified(request, etag, last_modified):
+    """
+    Returns True if the client's cached copy of a response is up to date.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``, since the ``ETag`` also reflects deleted records.
+    ETags of compressed responses match the uncompressed response's ETag.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [strip_etag(tag) for tag in parse_etags(if_none_match)]
+        return etag in etags or '*' in etags
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since and last_modified:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        return if_modified_since is not None and if_modified_since >= last_modified
+    return False
+
 def query(request, grid_id):
     """
     Returns the grid content in a JSON response
@@ -36,8 +145,167 @@ def query(request, grid_id):
 
     Returns:
         The JSON serialized grid contents.
+
+    If the grid has a ``response_cache``, responses are served from the cache when possible.
+
+    If the grid is ``conditional``, the response has an ``ETag`` (and a ``Last-Modified`` header, if the grid's version
+    provides one). If the client's copy is up to date, a ``304 Not Modified`` response is returned instead.
+
+    If the grid has a ``compression``, large responses are compressed.
+
+    If the grid has ``instrumentation``, the request's phases are timed.
+
+    If the grid has a ``page_prefetch``, the pages adjacent to the response's page are prefetched into the grid's
+    ``response_cache``.
+    """
+    cls = get_grid_class(grid_id)
+    grid = cls()
+    timings = grid.start_timing()
+    try:
+        if grid.conditional:
+            etag, last_modified = grid.get_etag(request.GET)
+            if last_modified:
+                last_modified = calendar.timegm(last_modified.utctimetuple())
+            if _is_not_modified(request, etag, last_modified):
+                response = HttpResponseNotModified()
+            else:
+                response = _get_response(grid, request)
+            response['ETag'] = quote_etag(etag)
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            # The client may store the response, but has to revalidate it every time
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            response = _get_response(grid, request)
+
+        if grid.compression:
+            with grid.timed('compress'):
+                response = grid.compression.compress_response(request, response)
+        if timings:
+            finished, timings = timings, None
+            response = grid.instrumentation.finish(finished, response)
+    finally:
+        if timings:
+            timings.finish()  # The request failed, stop timing it and restore the debug cursor
+    return response
+
+def _get_response(grid, request):
+    """
+    Returns the JSON response with the grid's contents, using the grid's ``response_cache`` if it has one.
+
+    Large pages are streamed instead (see ``Grid.is_streamed``). Streamed responses are not cached.
+    """
+    if grid.is_streamed(request.GET):
+        data, rows = grid.iter_json_data(request.GET)
+        return StreamingJsonResponse(data, rows, chunk_size=grid.stream_chunk_size)
+    content, total = _get_content(grid, request.GET)
+    response = HttpResponse(content, content_type='application/json')
+    if grid.page_prefetch:
+        grid.page_prefetch.schedule(grid, request.GET, total)
+    return response
+
+def get_grid_content(grid, querydict):
+    """
+    Returns the grid's contents serialized to JSON, using the grid's ``response_cache`` if it has one.
+
+    This is the content of the ``query`` view's response, for callers that embed grid contents in responses of their
+    own, such as the ``batch`` view and the ``jqgrid`` template tag. The contents are never streamed, so callers
+    should check ``Grid.is_streamed`` first.
+
+    Args:
+        grid: The grid
+        querydict: The query dictionary of the grid's request
+    Returns:
+        The JSON string
+    """
+    return _get_content(grid, querydict)[0]
+
+def _get_content(grid, querydict):
+    """
+    Returns a ``(content, total)`` tuple - the grid's contents serialized to JSON (see ``get_grid_content``), and their
+    number of pages.
+    """
+    cache = grid.response_cache
+    if cache:
+        with grid.timed('cache'):
+            key = cache.get_key(grid, querydict)
+            cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    data = grid.get_json_data(querydict)
+    with grid.timed('encode'):
+        content = encode(data)
+    if cache:
+        with grid.timed('cache'):
+            cache.set(key, content, data['total'])
+    return content, data['total']
+
+def export(request, grid_id):
+    """
+    Exports the grid's rows as a CSV file
+
+    The export has the request's search and sort, and the columns chosen by the ``columns`` or ``visible`` query
+    string parameters (see ``Grid.get_export_columns``). It is streamed to the client as the rows are retrieved, one
+    chunk of ``export_chunk_size`` records at a time (see ``Grid.iter_export_rows``), so the client starts receiving
+    the file immediately, and the whole export is never held in memory.
+
+    Args:
+        request: Django request
+        grid_id: ID of the grid. The ID is generated by Grid.get_grid_id
+
+    Returns:
+        The streamed CSV response.
+
+    Raises:
+        Http404 if the grid's ``csv_export`` is not set
     """
     cls = get_grid_class(grid_id)
     grid = cls()
-    data = grid.get_json_data(request.GET)
-    return JsonResponse(data)
+    if not grid.csv_export:
+        raise Http404('Grid %s can not be exported' % cls.__name__)
+    rows = grid.iter_export_rows(request.GET)
+    return StreamingCsvResponse(rows, filename=grid.get_export_filename(), chunk_size=grid.export_chunk_size)
+
+# The maximal number of grids in one batch request
+MAX_BATCH_SIZE = 20
+
+def batch(request):
+    """
+    Returns the contents of several grids in one JSON response
+
+    Pages with many grids can load all of them with one request, instead of a request for each grid - see the
+    ``batch`` argument of the ``jqgrid`` template tag.
+
+    The request's ``requests`` query string parameter is a JSON list of ``[grid_id, querystring]`` pairs. The
+    response is a JSON list with the contents of each grid, as returned by the ``query`` view - the grids'
+    ``response_cache`` is used, but the contents are never streamed, conditional or compressed. Pages that would be
+    streamed (see ``Grid.is_streamed``) are too large to be buffered in the batch response - their contents are
+    ``null``, and the client loads them with the ``query`` view instead.
+
+    Args:
+        request: Django request
+
+    Returns:
+        The JSON serialized grid contents, or a ``400 Bad Request`` response if the requests are invalid, or there
+        are more than ``MAX_BATCH_SIZE`` of them.
+
+    Raises:
+        KeyError if a grid ID hasn't been registered
+    """
+    try:
+        requests = json.loads(request.GET['requests'])
+        if not isinstance(requests, list):
+            raise TypeError('Batch requests must be a list')
+        requests = [(str(grid_id), str(querystring)) for grid_id, querystring in requests]
+    except (KeyError, TypeError, ValueError):
+        return HttpResponseBadRequest('Invalid batch requests')
+    if len(requests) > MAX_BATCH_SIZE:
+        return HttpResponseBadRequest('Too many batch requests')
+
+    contents = []
+    for grid_id, querystring in requests:
+        grid = get_grid_class(grid_id)()
+        querydict = QueryDict(querystring)
+        contents.append('null' if grid.is_streamed(querydict) else get_grid_content(grid, querydict))
+    return HttpResponse('[' + ','.join(contents) + ']', content_type='application/json')
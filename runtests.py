@@ -0,0 +1,20 @@
+"""
+Runs the tests, see the ``tests`` package.
+"""
+import os
+import sys
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+
+from django.conf import settings
+from django.test.utils import get_runner
+
+__author__ = 'zmbq'
+
+def main():
+    runner = get_runner(settings)(verbosity=1, interactive=False)
+    failures = runner.run_tests(sys.argv[1:] or ['tests'])
+    sys.exit(bool(failures))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+"""
+The tests of djqgrid.
+
+The tests run in a Django project of their own, with an in-memory SQLite database and the models in ``tests.models``.
+Run them from the repository's root directory::
+
+    python runtests.py
+"""
@@ -0,0 +1,38 @@
+"""
+Models for the tests.
+"""
+from django.db import models
+
+__author__ = 'zmbq'
+
+class Region(models.Model):
+    name = models.CharField(max_length=50)
+
+class Customer(models.Model):
+    name = models.CharField(max_length=50)
+    region = models.ForeignKey(Region, null=True)
+
+class Order(models.Model):
+    title = models.CharField(max_length=50)
+    amount = models.IntegerField()
+    shipped = models.BooleanField(default=False)
+    customer = models.ForeignKey(Customer, related_name='orders')
+
+    @property
+    def label(self):
+        return u'%s (%d)' % (self.title, self.amount)
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50)
+    orders = models.ManyToManyField(Order, related_name='tags')
+
+def populate(customers=5, orders=10):
+    """
+    Creates ``customers`` customers with ``orders`` orders each. Every other customer has a region.
+    """
+    region = Region.objects.create(name=u'North')
+    for i in range(customers):
+        customer = Customer.objects.create(name=u'Customer %d' % i, region=region if i % 2 == 0 else None)
+        Order.objects.bulk_create([Order(title=u'Order %d-%d' % (i, j), amount=i * orders + j, shipped=j % 2 == 0,
+                                         customer=customer)
+                                   for j in range(orders)])
@@ -0,0 +1,10 @@
+"""
+Settings of the test project.
+"""
+SECRET_KEY = 'djqgrid-tests'
+DEBUG = False
+DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+INSTALLED_APPS = ['django.contrib.contenttypes', 'djqgrid', 'tests']
+ROOT_URLCONF = 'tests.urls'
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+USE_TZ = False
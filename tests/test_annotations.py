@@ -0,0 +1,59 @@
+from django.db import connection
+from django.db.models import Count, Max
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from djqgrid.columns import AggregateColumn, ExpressionColumn, KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Customer, Order, populate
+
+__author__ = 'zmbq'
+
+class CustomerGrid(Grid):
+    model = Customer
+    csv_export = True
+    version_field = 'id'
+
+    id = KeyColumn('pk')
+    name = TextColumn('Name', 'name')
+    orders = AggregateColumn('Orders', 'order_count', Count('orders'))
+    largest = AggregateColumn('Largest', 'largest_order', Max('orders__amount'))
+    double = ExpressionColumn('Double', 'double_id', '"tests_customer"."id" * 2')
+
+class AnnotationTest(TestCase):
+    def setUp(self):
+        populate(customers=5, orders=4)
+        Order.objects.filter(customer__name=u'Customer 3').delete()
+
+    def get_page(self, **params):
+        querydict = {'page': '1', 'rows': '3', 'sidx': 'largest', 'sord': 'desc'}
+        querydict.update(params)
+        with CaptureQueriesContext(connection) as queries:
+            data = CustomerGrid().get_json_data(querydict)
+        return data, [query['sql'] for query in queries.captured_queries]
+
+    def test_page(self):
+        data, queries = self.get_page()
+        self.assertEqual([(row['name'], row['orders'], row['largest']) for row in data['rows']],
+                         [(u'Customer 4', u'4', u'19'), (u'Customer 2', u'4', u'11'), (u'Customer 1', u'4', u'7')])
+        self.assertEqual(data['rows'][0]['double'], unicode(2 * Customer.objects.get(name=u'Customer 4').pk))
+        self.assertEqual(data['records'], 5)
+        self.assertEqual(len(queries), 2)
+
+    def test_count_is_not_annotated(self):
+        data, queries = self.get_page()
+        count = queries[0]
+        self.assertIn('COUNT', count)
+        self.assertNotIn('subquery', count)
+        self.assertNotIn('"tests_order"', count)
+
+    def test_version_is_not_annotated(self):
+        with CaptureQueriesContext(connection) as queries:
+            version, last_modified = CustomerGrid().get_version({})
+        self.assertTrue(version.endswith('|5'))
+        self.assertNotIn('"tests_order"', queries[0]['sql'])
+
+    def test_export(self):
+        rows = list(CustomerGrid().iter_export_rows({'sidx': 'orders', 'sord': 'asc', 'columns': 'name,orders'}))
+        self.assertEqual(rows[0], ['Name', 'Orders'])
+        self.assertEqual(rows[1], [u'Customer 3', u'0'])
+        self.assertEqual(len(rows), 6)
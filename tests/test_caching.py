@@ -0,0 +1,86 @@
+import json
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.test.client import RequestFactory
+from djqgrid import views
+from djqgrid.caching import ResponseCache
+from djqgrid.columns import KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Customer, Order, Region, Tag, populate
+
+__author__ = 'zmbq'
+
+class ResponseCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = ResponseCache()
+
+    def test_total_is_cached_with_content(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.contains('key'))
+        self.cache.set('key', '{"total": 0}', 0)
+        self.assertEqual(self.cache.get('key'), ('{"total": 0}', 0))
+        self.assertTrue(self.cache.contains('key'))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_evicted_content_is_a_miss(self):
+        self.cache.set('key', '{"total": 3}', 3)
+        cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+class CachedGrid(Grid):
+    model = Order
+    response_cache = ResponseCache()
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+    customer = TextColumn('Customer', 'customer.name')
+
+class InvalidationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        populate(customers=2, orders=2)
+        self.stats = CachedGrid.response_cache.stats
+
+    def query(self):
+        request = RequestFactory().get('/', {'rows': '10', 'sidx': 'key', 'sord': 'asc'})
+        return json.loads(views.query(request, CachedGrid.get_grid_id()).content)
+
+    def assertCounted(self, hits, misses):
+        stats = CachedGrid.response_cache.stats
+        self.assertEqual((stats['hits'] - self.stats['hits'], stats['misses'] - self.stats['misses']), (hits, misses))
+
+    def test_unchanged_data_is_cached(self):
+        first = self.query()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.query(), first)
+        self.assertCounted(1, 1)
+
+    def test_post_save(self):
+        self.query()
+        customer = Customer.objects.get(name=u'Customer 1')
+        customer.name = u'Renamed'
+        customer.save()
+        self.assertIn(u'Renamed', [row['customer'] for row in self.query()['rows']])
+        self.assertCounted(0, 2)
+
+    def test_post_delete(self):
+        self.query()
+        Order.objects.get(title=u'Order 0-0').delete()
+        self.assertEqual(self.query()['records'], 3)
+        self.assertCounted(0, 2)
+
+    def test_m2m_changed(self):
+        self.query()
+        tag = Tag.objects.create(name=u'Urgent')  # Tags are not shown in the grid
+        self.query()
+        self.assertCounted(1, 1)
+        tag.orders.add(Order.objects.get(title=u'Order 0-0'))
+        self.query()
+        self.assertCounted(1, 2)
+
+    def test_independent_models_are_ignored(self):
+        self.query()
+        Region.objects.create(name=u'South')
+        self.query()
+        self.assertCounted(1, 1)
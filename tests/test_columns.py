@@ -0,0 +1,27 @@
+from django.test import TestCase
+from djqgrid.columns import Column, TextColumn
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class UpperColumn(TextColumn):
+    def _get_model_attr(self, attr, model):
+        return super(UpperColumn, self)._get_model_attr(attr, model).upper()
+
+class ColumnTest(TestCase):
+    def setUp(self):
+        populate(customers=1, orders=2)
+
+    def test_model_attr_override(self):
+        column = UpperColumn('Title', 'title')
+        order = Order.objects.order_by('pk')[0]
+        self.assertEqual(column.render_text(order), u'ORDER 0-0')
+        self.assertEqual(column.render_cell(order), (u'ORDER 0-0', u'ORDER 0-0'))
+        self.assertEqual(column.render_texts([order]), [u'ORDER 0-0'])
+        self.assertIsNone(column.get_value_path())
+
+    def test_nested_model_path(self):
+        column = Column('Customer', 'customer.name')
+        order = Order.objects.order_by('pk')[0]
+        self.assertEqual(column.render_cell(order), (u'Customer 0', u'Customer 0'))
+        self.assertEqual(column.get_value_path(), 'customer__name')
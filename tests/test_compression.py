@@ -0,0 +1,89 @@
+import json
+import zlib
+from django.test import SimpleTestCase, TestCase
+from django.test.client import RequestFactory
+from djqgrid import views
+from djqgrid.columns import KeyColumn, TextColumn
+from djqgrid.compression import ResponseCompression, parse_accept_encoding, strip_etag
+from djqgrid.grid import Grid
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class CompressedGrid(Grid):
+    model = Order
+    compression = ResponseCompression(min_size=1024)
+    conditional = True
+    version_field = 'id'
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+
+def gunzip(data):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+class NegotiationTest(SimpleTestCase):
+    def get_encoding(self, header):
+        return ResponseCompression().get_encoding(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header))
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding('gzip;q=0.5, Deflate, br;q=x'),
+                         {'gzip': 0.5, 'deflate': 1.0, 'br': 0.0})
+
+    def test_get_encoding(self):
+        self.assertEqual(self.get_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(self.get_encoding('gzip;q=0.5, deflate'), 'deflate')
+        self.assertEqual(self.get_encoding('*'), 'gzip')
+        self.assertEqual(self.get_encoding('*, gzip;q=0'), 'deflate')
+        self.assertIsNone(self.get_encoding('identity'))
+        self.assertIsNone(self.get_encoding('br'))
+        self.assertIsNone(ResponseCompression().get_encoding(RequestFactory().get('/')))
+
+    def test_strip_etag(self):
+        self.assertEqual(strip_etag('abc;gzip'), 'abc')
+        self.assertEqual(strip_etag('abc'), 'abc')
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        populate()
+
+    def query(self, rows, encoding='gzip', **headers):
+        request = RequestFactory().get('/', {'rows': str(rows)}, HTTP_ACCEPT_ENCODING=encoding, **headers)
+        return views.query(request, CompressedGrid.get_grid_id())
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.query(1)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(json.loads(response.content)['rows']), 1)
+        self.assertFalse(response['ETag'].endswith(';gzip"'))
+
+    def test_large_responses_are_compressed(self):
+        response = self.query(40)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gunzip(response.content))['rows']), 40)
+
+    def test_not_accepted(self):
+        response = self.query(40, encoding='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_streamed_responses_are_compressed(self):
+        response = self.query(5000)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gunzip(''.join(response.streaming_content)))['rows']), 50)
+
+    def test_etag(self):
+        response = self.query(40)
+        etag = response['ETag']
+        self.assertTrue(etag.endswith(';gzip"'))
+        not_modified = self.query(40, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertIn('Accept-Encoding', not_modified['Vary'])
+
+        # A client that no longer accepts gzip gets the uncompressed response's ETag
+        not_modified = self.query(40, encoding='identity', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag.replace(';gzip', ''))
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.test import TestCase
+from djqgrid import counting
+from djqgrid.columns import Column, KeyColumn
+from djqgrid.grid import Grid
+from tests.models import Customer, Order, populate
+
+__author__ = 'zmbq'
+
+class CachedCountGrid(Grid):
+    model = Order
+    count_strategy = counting.CachedCount()
+
+    id = KeyColumn('pk')
+    amount = Column('Amount', 'amount')
+
+class EstimatedCountGrid(Grid):
+    model = Order
+    count_strategy = counting.EstimatedCount(exact_below=10)  # The SQLite stand-in counts the rows
+
+    id = KeyColumn('pk')
+    amount = Column('Amount', 'amount')
+
+def _get_page(gridcls, page):
+    return gridcls().get_json_data({'page': str(page), 'rows': '20', 'sidx': 'amount', 'sord': 'asc'})
+
+class CountingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        populate()  # 50 orders
+
+    def test_cached_count_is_reused(self):
+        _get_page(CachedCountGrid, 1)
+        with self.assertNumQueries(1):
+            data = _get_page(CachedCountGrid, 2)
+        self.assertEqual(data['records'], 50)
+
+    def test_cached_count_with_added_records(self):
+        _get_page(CachedCountGrid, 1)
+        customer = Customer.objects.all()[0]
+        Order.objects.bulk_create([Order(title=u'New %d' % i, amount=100 + i, customer=customer) for i in range(30)])
+
+        data = _get_page(CachedCountGrid, 4)  # Beyond the cached count's 3 pages
+        self.assertEqual(data['page'], 4)
+        self.assertEqual([row['amount'] for row in data['rows']], [unicode(100 + i) for i in range(10, 30)])
+        self.assertEqual(data['records'], 80)
+        self.assertEqual(data['total'], 4)
+
+    def test_cached_count_with_deleted_records(self):
+        _get_page(CachedCountGrid, 1)
+        Order.objects.filter(amount__gte=20).delete()
+
+        data = _get_page(CachedCountGrid, 3)  # The cached count's last page doesn't exist anymore
+        self.assertEqual(data['page'], 1)
+        self.assertEqual(data['records'], 20)
+        self.assertEqual(len(data['rows']), 20)
+
+    def test_estimated_count_is_not_clamped(self):
+        data = _get_page(EstimatedCountGrid, 3)
+        self.assertEqual(data['page'], 3)
+        self.assertEqual(data['records'], 50)
+        self.assertFalse(data['exact'])
+
+    def test_estimated_count_beyond_last_page(self):
+        with self.assertNumQueries(4):  # Estimate, empty page, count, last page
+            data = _get_page(EstimatedCountGrid, 99)
+        self.assertEqual(data['page'], 3)
+        self.assertEqual(data['records'], 50)
+        self.assertTrue(data['exact'])
+        self.assertEqual(len(data['rows']), 10)
@@ -0,0 +1,81 @@
+import csv
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from djqgrid import views
+from djqgrid.columns import ClientOnlyColumn, KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class ExportGrid(Grid):
+    model = Order
+    csv_export = True
+    export_chunk_size = 7
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+    amount = TextColumn('Amount', 'amount', hidden=True)
+    shipped = TextColumn('Shipped', 'shipped')
+    region = TextColumn('Region', 'customer.region')
+    actions = ClientOnlyColumn('Actions')
+
+class ValuesExportGrid(ExportGrid):
+    values_projection = True
+
+class NotExportedGrid(Grid):
+    model = Order
+
+    title = TextColumn('Title', 'title')
+
+class ExportTest(TestCase):
+    def setUp(self):
+        populate()
+
+    def export(self, gridcls=ExportGrid, **params):
+        request = RequestFactory().get('/', params)
+        with CaptureQueriesContext(connection) as queries:
+            response = views.export(request, gridcls.get_grid_id())
+            rows = list(csv.reader(''.join(response.streaming_content).splitlines()))
+        return rows, [query['sql'] for query in queries.captured_queries]
+
+    def test_not_exported(self):
+        request = RequestFactory().get('/')
+        self.assertRaises(Http404, views.export, request, NotExportedGrid.get_grid_id())
+
+    def test_default_columns(self):
+        rows, queries = self.export()
+        self.assertEqual(rows[0], ['Key', 'Title', 'Amount', 'Shipped', 'Region'])
+        self.assertEqual(len(rows), 51)
+
+    def test_chosen_columns(self):
+        rows, queries = self.export(columns='amount, title')
+        self.assertEqual(rows[0], ['Amount', 'Title'])
+        self.assertEqual(rows[1], ['0', 'Order 0-0'])
+        self.assertRaises(ValueError, self.export, columns='title,missing')
+
+    def test_visible_columns(self):
+        rows, queries = self.export(visible='true')
+        self.assertEqual(rows[0], ['Title', 'Shipped', 'Region'])
+
+    def test_chunks_are_seeked(self):
+        for gridcls in (ExportGrid, ValuesExportGrid):
+            rows, queries = self.export(gridcls, sidx='shipped', sord='desc', columns='amount')
+            expected = Order.objects.order_by('-shipped', '-pk').values_list('amount', flat=True)
+            self.assertEqual([int(row[0]) for row in rows[1:]], list(expected))
+            self.assertEqual(len(queries), 8)  # 50 rows in chunks of 7
+            self.assertFalse([sql for sql in queries if 'OFFSET' in sql])
+
+    def test_unsorted_export_is_seeked_by_pk(self):
+        rows, queries = self.export(columns='key')
+        self.assertEqual([int(row[0]) for row in rows[1:]], sorted(Order.objects.values_list('pk', flat=True)))
+        self.assertFalse([sql for sql in queries if 'OFFSET' in sql])
+
+    def test_nullable_sort_uses_offset(self):
+        rows, queries = self.export(sidx='region', sord='asc', columns='key')
+        self.assertEqual(len(set(row[0] for row in rows[1:])), 50)
+        self.assertEqual(len(queries), 8)
+        self.assertTrue([sql for sql in queries if 'OFFSET' in sql])
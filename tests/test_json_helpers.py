@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import json
+from decimal import Decimal
+from django.test import SimpleTestCase
+from djqgrid import json_helpers
+
+__author__ = 'zmbq'
+
+class EncoderTest(SimpleTestCase):
+    def setUp(self):
+        self._encoder = json_helpers._encoder
+
+    def tearDown(self):
+        json_helpers._encoder = self._encoder
+
+    def test_encoders_agree(self):
+        data = {'rows': [{'name': u'ש<b>', 'n': 10 ** 30, 'f': 0.1}], 'exact': True, 'userdata': None}
+        for name, load in json_helpers.encoders:
+            try:
+                json_helpers.set_encoder(name)
+            except ImportError:
+                continue
+            self.assertEqual(json.loads(json_helpers.encode(data)), data, name)
+            self.assertRaises(TypeError, json_helpers.encode, {'d': object()})
+            if name != 'ujson':
+                self.assertRaises(TypeError, json_helpers.encode, {'d': Decimal('1.10')})
+
+    def test_default_encoder(self):
+        json_helpers._encoder = None
+        self.assertIn(json_helpers.get_encoder(), [name for name, load in json_helpers.encoders])
+        self.assertRaises(ValueError, json_helpers.set_encoder, 'pickle')
+
+    def test_dumps_functions(self):
+        self.assertEqual(json_helpers.dumps({'loadComplete': json_helpers.function('onLoad'), 'rowNum': 20},
+                                            sort_keys=True),
+                         '{"loadComplete": onLoad, "rowNum": 20}')
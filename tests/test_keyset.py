@@ -0,0 +1,78 @@
+import json
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from djqgrid.columns import Column, KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class KeysetGrid(Grid):
+    model = Order
+    keyset_pagination = True
+    server_search = True
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+    amount = Column('Amount', 'amount')
+    region = TextColumn('Region', 'customer.region')  # Customer.region is nullable
+
+class KeysetTest(TestCase):
+    def setUp(self):
+        populate()
+
+    def get_page(self, page, cursor=None, **params):
+        querydict = {'page': str(page), 'rows': '10', 'sidx': 'amount', 'sord': 'desc'}
+        querydict.update(params)
+        if cursor is not None:
+            querydict['keyset'] = json.dumps(cursor)
+        with CaptureQueriesContext(connection) as queries:
+            data = KeysetGrid().get_json_data(querydict)
+        return data, [query['sql'] for query in queries.captured_queries]
+
+    def assert_amounts(self, data, amounts):
+        self.assertEqual([int(row['amount']) for row in data['rows']], list(amounts))
+
+    def test_next_and_previous_pages_seek(self):
+        first, _ = self.get_page(1)
+        self.assert_amounts(first, range(49, 39, -1))
+        second, queries = self.get_page(2, first['userdata']['keyset'])
+        self.assert_amounts(second, range(39, 29, -1))
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('OFFSET', queries[-1])
+
+        third, _ = self.get_page(3, second['userdata']['keyset'])
+        back, queries = self.get_page(2, third['userdata']['keyset'])
+        self.assert_amounts(back, range(39, 29, -1))
+        self.assertNotIn('OFFSET', queries[-1])
+
+    def test_other_pages_use_offset(self):
+        first, _ = self.get_page(1)
+        fourth, queries = self.get_page(4, first['userdata']['keyset'])
+        self.assert_amounts(fourth, range(19, 9, -1))
+        self.assertIn('OFFSET', queries[-1])
+
+    def test_changed_query_uses_offset(self):
+        first, _ = self.get_page(1)
+        cursor = first['userdata']['keyset']
+        # The cursor's page was not part of the searched rows
+        search = {'_search': 'true', 'searchField': 'amount', 'searchOper': 'lt', 'searchString': '25'}
+        second, queries = self.get_page(2, cursor, **search)
+        self.assert_amounts(second, range(14, 4, -1))
+        self.assertIn('OFFSET', queries[-1])
+
+    def test_changed_page_size_uses_offset(self):
+        first, _ = self.get_page(1)
+        second, queries = self.get_page(2, first['userdata']['keyset'], rows='20')
+        self.assert_amounts(second, range(29, 9, -1))
+        self.assertIn('OFFSET', queries[-1])
+
+    def test_nullable_sort_field(self):
+        data, _ = self.get_page(1, sidx='region', sord='asc')
+        self.assertNotIn('userdata', data)
+
+    def test_malformed_cursor(self):
+        data, queries = self.get_page(2, {'page': 1, 'sort': 'amount'})
+        self.assert_amounts(data, range(39, 29, -1))
+        self.assertIn('OFFSET', queries[-1])
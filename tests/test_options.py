@@ -0,0 +1,31 @@
+from django.test import SimpleTestCase
+from djqgrid.columns import KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Order
+
+__author__ = 'zmbq'
+
+class OptionsGrid(Grid):
+    model = Order
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title', searchoptions={'sopt': ['eq']})
+
+class OptionsTest(SimpleTestCase):
+    def test_columns(self):
+        options = OptionsGrid(rowNum=50).get_options()
+        self.assertEqual(options['colNames'], ['Key', 'Title'])
+        self.assertEqual([model['name'] for model in options['colModel']], ['key', 'title'])
+        self.assertEqual(options['rowNum'], 50)
+        self.assertEqual(options['url'], OptionsGrid.get_spec().url)
+
+    def test_changes_stay_local(self):
+        options = OptionsGrid().get_options()
+        options['colModel'][1]['hidden'] = True
+        options['colModel'][1]['searchoptions']['sopt'].append('ne')
+        options['colNames'][1] = 'Changed'
+
+        options = OptionsGrid().get_options()
+        self.assertNotIn('hidden', options['colModel'][1])
+        self.assertEqual(options['colModel'][1]['searchoptions'], {'sopt': ['eq']})
+        self.assertEqual(options['colNames'][1], 'Title')
@@ -0,0 +1,38 @@
+from django.test import TestCase
+from djqgrid.columns import KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class PagingGrid(Grid):
+    model = Order
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+
+class PagingTest(TestCase):
+    def setUp(self):
+        populate()  # 50 orders
+
+    def test_page_takes_count_and_slice(self):
+        with self.assertNumQueries(2):
+            data = PagingGrid().get_json_data({'page': '2', 'rows': '20', 'sidx': 'title', 'sord': 'asc'})
+        self.assertEqual(data['records'], 50)
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(data['page'], 2)
+        self.assertEqual([row['title'] for row in data['rows']],
+                         [order.title for order in Order.objects.order_by('title')[20:40]])
+
+    def test_page_out_of_range(self):
+        with self.assertNumQueries(2):
+            data = PagingGrid().get_json_data({'page': '99', 'rows': '20', 'sidx': 'title', 'sord': 'asc'})
+        self.assertEqual(data['page'], 3)
+        self.assertEqual(len(data['rows']), 10)
+
+    def test_empty_grid_skips_page_query(self):
+        Order.objects.all().delete()
+        with self.assertNumQueries(1):
+            data = PagingGrid().get_json_data({'page': '1', 'rows': '20'})
+        self.assertEqual(data['records'], 0)
+        self.assertEqual(data['rows'], [])
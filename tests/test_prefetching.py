@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.client import RequestFactory
+from djqgrid import views
+from djqgrid.caching import ResponseCache
+from djqgrid.columns import KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from djqgrid.prefetching import PagePrefetcher
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class RecordingPrefetcher(PagePrefetcher):
+    """ Records the prefetches it starts instead of running them """
+    def __init__(self, *args, **kwargs):
+        super(RecordingPrefetcher, self).__init__(*args, **kwargs)
+        self.pages = []
+
+    def _start(self, gridcls, querydict, key):
+        self.pages.append(int(querydict['page']))
+        self._running.discard(key)
+        self._workers.release()
+
+class PrefetchGrid(Grid):
+    model = Order
+    response_cache = ResponseCache(timeout=300)
+    page_prefetch = RecordingPrefetcher(previous=True)
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+
+class PrefetchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        populate()  # 50 orders
+        PrefetchGrid.page_prefetch.pages = []
+
+    def query(self, page):
+        request = RequestFactory().get('/', {'page': str(page), 'rows': '20'})
+        return views.query(request, PrefetchGrid.get_grid_id())
+
+    def test_pages(self):
+        prefetcher = PagePrefetcher(previous=True)
+        self.assertEqual(prefetcher.get_pages({'page': '1'}), [2])
+        self.assertEqual(prefetcher.get_pages({'page': '2'}, total=3), [3, 1])
+        self.assertEqual(prefetcher.get_pages({'page': '3'}, total=3), [2])
+        self.assertEqual(prefetcher.get_pages({'page': '9'}, total=3), [])
+        self.assertEqual(PagePrefetcher().get_pages({'page': 'x'}), [])
+
+    def test_next_page_is_prefetched(self):
+        self.query(1)
+        self.assertEqual(PrefetchGrid.page_prefetch.pages, [2])
+
+    def test_no_prefetch_beyond_last_page(self):
+        self.query(3)
+        self.assertEqual(PrefetchGrid.page_prefetch.pages, [2])
+
+    def test_cached_response(self):
+        self.query(3)
+        PrefetchGrid.page_prefetch.pages = []
+        with self.assertNumQueries(0):
+            self.query(3)
+        self.assertEqual(PrefetchGrid.page_prefetch.pages, [2])
+
+    def test_cached_pages_are_not_prefetched(self):
+        self.query(3)
+        PrefetchGrid.page_prefetch.pages = []
+        stats = PrefetchGrid.response_cache.stats
+        self.query(2)
+        self.assertEqual(PrefetchGrid.page_prefetch.pages, [1])
+        # Checking whether page 3 is cached doesn't count as a hit
+        self.assertEqual(PrefetchGrid.response_cache.stats['hits'], stats['hits'])
+        self.assertEqual(PrefetchGrid.response_cache.stats['misses'], stats['misses'] + 1)
@@ -0,0 +1,58 @@
+from django.test import TestCase
+from djqgrid.columns import KeyColumn, LinkColumn, TemplateColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class ValuesGrid(Grid):
+    model = Order
+    values_projection = True
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+    customer = TextColumn('Customer', 'customer.name')
+
+class TemplateGrid(Grid):
+    model = Order
+    values_projection = True
+
+    id = KeyColumn('pk')
+    title = LinkColumn('Title', 'title', url_builder=lambda model: '/customers/%d' % model.customer_id)
+    amount = TemplateColumn('Amount', 'amount', template='<b>{{ model.amount }}</b>')
+
+class OnlyFieldsGrid(TemplateGrid):
+    only_fields = ('customer', 'amount')
+
+def _get_page(gridcls):
+    return gridcls().get_json_data({'page': '1', 'rows': '10', 'sidx': 'title', 'sord': 'asc'})
+
+class ProjectionTest(TestCase):
+    def setUp(self):
+        populate()
+
+    def test_values(self):
+        grid = ValuesGrid()
+        queryset, paths = grid._apply_projection(grid._get_query_results({}))
+        self.assertEqual(paths, ['pk', 'title', 'customer__name'])
+        with self.assertNumQueries(2):
+            data = _get_page(ValuesGrid)
+        self.assertEqual(data['rows'][0]['customer'], u'Customer 0')
+
+    def test_unknown_fields_retrieve_instances(self):
+        grid = TemplateGrid()
+        queryset, paths = grid._apply_projection(grid._get_query_results({}))
+        self.assertIsNone(paths)
+        self.assertEqual(queryset.query.deferred_loading, (set(), True))
+        with self.assertNumQueries(2):
+            data = _get_page(TemplateGrid)
+        self.assertEqual(data['rows'][0]['html']['amount'], u'<b>0</b>')
+
+    def test_only_fields(self):
+        grid = OnlyFieldsGrid()
+        queryset, paths = grid._apply_projection(grid._get_query_results({}))
+        self.assertEqual(queryset.query.deferred_loading[1], False)  # only() was applied
+        with self.assertNumQueries(2):
+            data = _get_page(OnlyFieldsGrid)
+        self.assertEqual(data['rows'][0]['html']['title'], u'<a href="/customers/%d">Order 0-0</a>'
+                         % Order.objects.get(title=u'Order 0-0').customer_id)
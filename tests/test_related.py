@@ -0,0 +1,80 @@
+from django.test import TestCase
+from djqgrid.columns import Column, KeyColumn, TextColumn
+from djqgrid.grid import Grid, _plan_related_lookups
+from tests.models import Customer, Order, Tag, populate
+
+__author__ = 'zmbq'
+
+class NamesColumn(Column):
+    """ Renders the names of a related manager's objects """
+    field = 'name'
+
+    def _get_model_value(self, model):
+        return u', '.join(sorted(getattr(related, self.field)
+                                 for related in self._get_model_attr(self.model_path, model).all()))
+
+class TitlesColumn(NamesColumn):
+    field = 'title'
+
+class OrderGrid(Grid):
+    model = Order
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+    customer = TextColumn('Customer', 'customer.name')
+    region = TextColumn('Region', 'customer.region')
+
+class ManualOrderGrid(OrderGrid):
+    auto_related = False
+
+class CustomerGrid(Grid):
+    model = Customer
+
+    id = KeyColumn('pk')
+    name = TextColumn('Name', 'name')
+    orders = TitlesColumn('Orders', 'orders')
+
+class TaggedOrderGrid(Grid):
+    model = Order
+
+    id = KeyColumn('pk')
+    customer = TextColumn('Customer', 'customer.name')
+    tags = NamesColumn('Tags', 'tags')
+
+class RelatedLookupsTest(TestCase):
+    def setUp(self):
+        populate()
+        urgent, late = Tag.objects.create(name=u'Urgent'), Tag.objects.create(name=u'Late')
+        urgent.orders.add(*Order.objects.filter(amount__lt=5))
+        late.orders.add(*Order.objects.filter(amount__lt=2))
+
+    def get_rows(self, gridcls, rows='20'):
+        return gridcls().get_json_data({'page': '1', 'rows': rows, 'sidx': 'key', 'sord': 'asc'})['rows']
+
+    def test_plan(self):
+        self.assertEqual(_plan_related_lookups(Order, ['title', 'customer.region.name']),
+                         (set(['customer__region']), set()))
+        self.assertEqual(_plan_related_lookups(Order, ['customer__orders', 'tags']),
+                         (set(['customer']), set(['customer__orders', 'tags'])))
+        self.assertEqual(_plan_related_lookups(Customer, ['orders.customer', 'region.customer_set']),
+                         (set(['region']), set(['orders__customer', 'region__customer_set'])))
+
+    def test_select_related(self):
+        with self.assertNumQueries(2):  # Count and page
+            rows = self.get_rows(OrderGrid)
+        self.assertEqual(len(set(row['customer'] for row in rows)), 2)
+
+    def test_without_auto_related(self):
+        with self.assertNumQueries(2 + 20 + 10):  # Each row's customer, and the regions of half the customers
+            self.get_rows(ManualOrderGrid)
+
+    def test_prefetch_related(self):
+        with self.assertNumQueries(3):  # Count, page and orders
+            rows = self.get_rows(CustomerGrid)
+        self.assertEqual(rows[0]['orders'], u', '.join(sorted(u'Order 0-%d' % i for i in range(10))))
+
+    def test_many_to_many(self):
+        with self.assertNumQueries(3):  # Count, page with customers, and tags
+            rows = self.get_rows(TaggedOrderGrid)
+        self.assertEqual([row['tags'] for row in rows[:6]],
+                         [u'Late, Urgent', u'Late, Urgent', u'Urgent', u'Urgent', u'Urgent', u''])
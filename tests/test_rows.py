@@ -0,0 +1,125 @@
+from django.test import TestCase
+from djqgrid.columns import KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Customer, Order, populate
+
+__author__ = 'zmbq'
+
+class BoldColumn(TextColumn):
+    def render_html(self, model):
+        return u'<b>%s</b>' % self.render_text(model)
+
+class CompactGrid(Grid):
+    model = Order
+    compact_rows = True
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+    amount = BoldColumn('Amount', 'amount')
+
+    def _get_additional_data(self, model):
+        return {'big': True} if model.amount >= 48 else None
+
+class ValuesCompactGrid(Grid):
+    model = Order
+    compact_rows = True
+    values_projection = True
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+
+class OverriddenGrid(CompactGrid):
+    def _model_to_dict(self, model):
+        row = super(OverriddenGrid, self)._model_to_dict(model)
+        row['title'] = row['html']['title'] = row['title'].upper()
+        return row
+
+class CompactRowsTest(TestCase):
+    def setUp(self):
+        populate()  # Amounts 0 to 49
+
+    def get_rows(self, gridcls, **params):
+        querydict = {'page': '1', 'rows': '50', 'sidx': 'amount', 'sord': 'asc'}
+        querydict.update(params)
+        return gridcls().get_json_data(querydict)['rows']
+
+    def test_reader(self):
+        self.assertEqual(CompactGrid().get_options()['jsonReader'], {'repeatitems': True, 'cell': '', 'id': '0'})
+        reader = {'repeatitems': False}
+        self.assertEqual(CompactGrid().get_options({'jsonReader': reader})['jsonReader'], reader)
+
+    def test_rows(self):
+        rows = self.get_rows(CompactGrid)
+        first = Order.objects.get(amount=0)
+        self.assertEqual(rows[0], [unicode(first.pk), u'Order 0-0', u'0', {'html': {'amount': u'<b>0</b>'}}])
+        self.assertEqual(rows[-1][-1], {'html': {'amount': u'<b>49</b>'}, 'additional': {'big': True}})
+
+    def test_rows_match_dictionaries(self):
+        grid = CompactGrid()
+        grid.compact_rows = False
+        rows = grid.get_json_data({'page': '1', 'rows': '50', 'sidx': 'amount', 'sord': 'asc'})['rows']
+        self.assertEqual([grid._dict_to_list(row) for row in rows], self.get_rows(CompactGrid))
+
+    def test_values_rows(self):
+        rows = self.get_rows(ValuesCompactGrid, sidx='title')
+        self.assertEqual(rows[0], [unicode(Order.objects.get(title=u'Order 0-0').pk), u'Order 0-0'])
+
+    def test_overridden_model_to_dict(self):
+        rows = self.get_rows(OverriddenGrid)
+        self.assertEqual(rows[0][1:], [u'ORDER 0-0', u'0', {'html': {'amount': u'<b>0</b>'}}])
+        self.assertEqual(rows[-1][1:], [u'ORDER 4-9', u'49', {'html': {'amount': u'<b>49</b>'},
+                                                               'additional': {'big': True}}])
+
+    def test_dict_to_list(self):
+        grid = CompactGrid()
+        row = {'key': u'1', 'title': u'A', 'html': {'key': u'1', 'title': u'<i>A</i>'}}
+        self.assertEqual(grid._dict_to_list(row), [u'1', u'A', None, {'html': {'title': u'<i>A</i>'}}])
+        self.assertEqual(grid._dict_to_list({'key': u'1', 'title': u'A', 'amount': u'2'}), [u'1', u'A', u'2'])
+
+class CustomerNameColumn(TextColumn):
+    """ Retrieves the customer names of a page in one query """
+    def prepare(self, models):
+        return dict(Customer.objects.filter(pk__in=set(model.customer_id for model in models))
+                    .values_list('pk', 'name'))
+
+    def render_from_prepared(self, model, prepared):
+        text = prepared[model.customer_id]
+        return text, u'<i>%s</i>' % text
+
+class PreparedGrid(Grid):
+    model = Order
+
+    id = KeyColumn('pk')
+    customer = CustomerNameColumn('Customer', 'customer_id')
+
+    def _get_additional_data_bulk(self, models):
+        shipped = set(Order.objects.filter(pk__in=[model.pk for model in models], shipped=True)
+                      .values_list('pk', flat=True))
+        return [{'shipped': True} if model.pk in shipped else None for model in models]
+
+class PreparedRowsTest(TestCase):
+    def setUp(self):
+        populate()
+
+    def test_page_queries(self):
+        with self.assertNumQueries(4):  # Count, page, prepare and additional data
+            rows = PreparedGrid().get_json_data({'page': '1', 'rows': '20', 'sidx': 'key', 'sord': 'asc'})['rows']
+        orders = Order.objects.select_related('customer').order_by('pk')[:20]
+        self.assertEqual([row['customer'] for row in rows], [order.customer.name for order in orders])
+        self.assertEqual([row['html']['customer'] for row in rows],
+                         [u'<i>%s</i>' % order.customer.name for order in orders])
+        self.assertEqual([row.get('additional') for row in rows],
+                         [{'shipped': True} if order.shipped else None for order in orders])
+
+    def test_single_cell(self):
+        column = PreparedGrid.base_columns['customer']
+        order = Order.objects.order_by('pk')[0]
+        with self.assertNumQueries(1):
+            self.assertEqual(column.render_cell(order), (u'Customer 0', u'<i>Customer 0</i>'))
+        self.assertEqual(column.render_texts([order]), [u'Customer 0'])
+
+    def test_default_bulk_additional_data(self):
+        orders = list(Order.objects.order_by('pk')[:3])
+        self.assertEqual(CompactGrid()._get_additional_data_bulk(orders), [None, None, None])
+        self.assertEqual(CompactGrid()._get_additional_data_bulk(list(Order.objects.filter(amount=48))),
+                         [{'big': True}])
@@ -0,0 +1,104 @@
+import json
+from django.test import TestCase
+from djqgrid import filtering
+from djqgrid.columns import Column, KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from tests.models import Customer, Order, populate
+
+__author__ = 'zmbq'
+
+class SearchGrid(Grid):
+    model = Order
+    server_search = True
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+    amount = Column('Amount', 'amount')
+    shipped = Column('Shipped', 'shipped')
+    customer = TextColumn('Customer', 'customer.name')
+    label = TextColumn('Label', 'label')  # Not a query path, can't be searched in the database
+
+class OrdersColumn(TextColumn):
+    """ Searches the titles of a customer's orders """
+    def _get_model_value(self, model):
+        return u', '.join(order.title for order in model.orders.all())
+
+class CustomerSearchGrid(Grid):
+    model = Customer
+    server_search = True
+
+    id = KeyColumn('pk')
+    name = TextColumn('Name', 'name')
+    order = OrdersColumn('Order', 'orders.title')
+
+def _filters(group_op, *rules):
+    return json.dumps({'groupOp': group_op, 'rules': [{'field': field, 'op': op, 'data': data}
+                                                      for field, op, data in rules]})
+
+class SearchFilterTest(TestCase):
+    def get_filter(self, querydict):
+        spec = SearchGrid.get_spec()
+        return filtering.get_search_filter(querydict, spec.search_columns, lambda path: None)
+
+    def test_no_search(self):
+        self.assertIsNone(self.get_filter({'_search': 'false', 'searchField': 'title', 'searchString': 'x'}))
+
+    def test_single_field(self):
+        q = self.get_filter({'_search': 'true', 'searchField': 'Customer', 'searchOper': 'bw', 'searchString': 'Cu'})
+        self.assertEqual(q.children, [('customer__name__istartswith', u'Cu')])
+        self.assertFalse(q.negated)
+
+    def test_negated_operator(self):
+        q = self.get_filter({'_search': 'true', 'searchField': 'title', 'searchOper': 'nc', 'searchString': 'x'})
+        self.assertTrue(q.negated)
+        self.assertEqual(q.children, [('title__icontains', u'x')])
+
+    def test_advanced_search(self):
+        q = self.get_filter({'_search': 'true', 'filters': _filters('OR', ('title', 'cn', 'a'), ('amount', 'nu', ''))})
+        self.assertEqual(q.connector, 'OR')
+        self.assertEqual(filtering.get_filter_paths(q), set(['title', 'amount']))
+
+    def test_invalid_searches(self):
+        self.assertRaises(ValueError, self.get_filter, {'_search': 'true', 'searchField': 'nothing'})
+        self.assertRaises(ValueError, self.get_filter, {'_search': 'true', 'filters': '{not json'})
+        self.assertRaises(ValueError, self.get_filter, {'_search': 'true', 'filters': _filters('XOR')})
+        self.assertRaises(ValueError, self.get_filter, {'_search': 'true', 'searchField': 'title',
+                                                        'searchOper': 'regexp'})
+
+    def test_unsearchable_column_is_ignored(self):
+        self.assertIsNone(self.get_filter({'_search': 'true', 'searchField': 'label', 'searchString': 'x'}))
+        q = self.get_filter({'_search': 'true', 'filters': _filters('AND', ('label', 'eq', 'x'), ('title', 'eq', 'y'))})
+        self.assertEqual(q.children, [('title__exact', u'y')])
+
+class GridSearchTest(TestCase):
+    def setUp(self):
+        populate()
+
+    def search(self, gridcls, **querydict):
+        querydict.update({'_search': 'true', 'rows': '100'})
+        return gridcls().get_json_data(querydict)
+
+    def test_typed_values(self):
+        data = self.search(SearchGrid, filters=_filters('AND', ('amount', 'ge', '45'), ('shipped', 'eq', 'true')))
+        self.assertEqual(sorted(row['amount'] for row in data['rows']), [u'46', u'48'])
+        self.assertRaises(ValueError, self.search, SearchGrid, searchField='amount', searchOper='eq',
+                          searchString='many')
+
+    def test_related_search(self):
+        data = self.search(SearchGrid, searchField='customer', searchOper='eq', searchString='Customer 1')
+        self.assertEqual(data['records'], 10)
+
+    def test_multi_valued_search_is_distinct(self):
+        data = self.search(CustomerSearchGrid, searchField='order', searchOper='bw', searchString='Order 2-')
+        self.assertEqual(data['records'], 1)
+
+    def test_unsearchable_column(self):
+        data = self.search(SearchGrid, searchField='label', searchOper='eq', searchString='x')
+        self.assertEqual(data['records'], 50)
+
+    def test_server_search_is_opt_in(self):
+        class PlainGrid(Grid):
+            model = Order
+            title = TextColumn('Title', 'title')
+        data = self.search(PlainGrid, searchField='title', searchOper='eq', searchString='x')
+        self.assertEqual(data['records'], 50)
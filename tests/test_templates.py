@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from django.template import Context, Template
+from django.test import SimpleTestCase
+from djqgrid.columns import LinkColumn, TemplateColumn
+from djqgrid.template_compiler import compile_template, flatten
+
+__author__ = 'zmbq'
+
+class Model(object):
+    def __init__(self, name, pk=1):
+        self.name = name
+        self.pk = pk
+
+TEMPLATES = [
+    u'{{ model.name }}',
+    u'<b>{{ model.name|upper }}</b> ({{ model.pk }})',
+    u'\n    <span>\n        {{ model.name }}\n    </span>\n',
+    u'{{ model.name }}\n{{ model.pk }}',
+    u'  <i>{{ model.name }}</i>  {{ model.name|default:"-" }}  ',
+]
+
+NAMES = [u'plain', u'<script>&"\'', u'  padded  ', u'   ', u'', u'two\nlines', None, 42, u'שלום', b'bytes']
+
+class CompiledTemplateTest(SimpleTestCase):
+    def test_same_output_as_template(self):
+        for source in TEMPLATES:
+            template = Template(source)
+            compiled = compile_template(template)
+            if compiled is None:
+                continue
+            for name in NAMES:
+                expected = flatten(template.render(Context({'model': Model(name)})))
+                self.assertEqual(compiled.render(Context({'model': Model(name)})), expected,
+                                 '%r with name %r' % (source, name))
+
+    def test_only_simple_templates_are_compiled(self):
+        self.assertIsNotNone(compile_template(Template(TEMPLATES[1])))
+        self.assertIsNone(compile_template(Template(u'{% if model.name %}{{ model.name }}{% endif %}')))
+
+    def test_template_column(self):
+        column = TemplateColumn('Name', 'name', template=TEMPLATES[2])
+        template = Template(TEMPLATES[2].strip())
+        models = [Model(name) for name in NAMES]
+        expected = [flatten(template.render(Context({'model': model}))) for model in models]
+        self.assertEqual([html for text, html in column.render_cells(models)], expected)
+        self.assertEqual([column.render_html(model) for model in models], expected)
+
+    def test_link_column(self):
+        column = LinkColumn('Name', 'name', url_builder=lambda model: '/models/%s?a=1&b=2' % model.pk)
+        template = Template(LinkColumn.template.strip())
+        for name in NAMES:
+            model = Model(name)
+            expected = flatten(template.render(Context({'url': '/models/1?a=1&b=2', 'name': name})))
+            self.assertEqual(column.render_html(model), expected, repr(name))
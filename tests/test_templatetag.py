@@ -0,0 +1,48 @@
+import json
+import re
+from django.template import Context
+from django.test import TestCase
+from django.test.client import RequestFactory
+from djqgrid.columns import KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from djqgrid.templatetags.jqgrid import jqgrid
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class InlineGrid(Grid):
+    model = Order
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+
+class TemplateTagTest(TestCase):
+    def setUp(self):
+        populate()
+        Order.objects.filter(pk=Order.objects.order_by('title')[0].pk).update(title=u'</script><b>')
+
+    def render(self, grid, **kwargs):
+        context = Context({'request': RequestFactory().get('/')})
+        return jqgrid(context, grid, **kwargs)
+
+    def get_inline_data(self, html):
+        match = re.search(r"\.data\('djqgridInline', (.*)\);\n", html)
+        return json.loads(match.group(1)) if match else None
+
+    def test_inline(self):
+        html = self.render(InlineGrid(), inline=True, sortname='title', rowNum=10)
+        self.assertIn('inlineDatatype', html)
+        self.assertNotIn('</script><b>', html)
+        data = self.get_inline_data(html)
+        self.assertEqual(data['records'], 50)
+        self.assertEqual(data['rows'][0]['title'], u'</script><b>')
+        self.assertEqual(len(data['rows']), 10)
+
+    def test_streamed_grid_is_not_inlined(self):
+        html = self.render(InlineGrid(), inline=True, pager=False)
+        self.assertIsNone(self.get_inline_data(html))
+        self.assertNotIn('inlineDatatype', html)
+
+    def test_batch(self):
+        self.assertIn('batchDatatype', self.render(InlineGrid(), batch=True))
+        self.assertNotIn('batchDatatype', self.render(InlineGrid(), batch=True, pager=False))
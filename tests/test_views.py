@@ -0,0 +1,146 @@
+import json
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.client import RequestFactory
+from djqgrid import views
+from djqgrid.caching import ResponseCache
+from djqgrid.columns import Column, KeyColumn, TextColumn
+from djqgrid.grid import Grid
+from djqgrid.timing import Instrumentation
+from tests.models import Order, populate
+
+__author__ = 'zmbq'
+
+class FailingColumn(Column):
+    def render_value(self, value):
+        raise RuntimeError('Rendering failed')
+
+class TimedGrid(Grid):
+    model = Order
+    instrumentation = Instrumentation(server_timing=True)
+
+    id = KeyColumn('pk')
+    title = TextColumn('Title', 'title')
+
+class FailingGrid(TimedGrid):
+    amount = FailingColumn('Amount', 'amount')
+
+class QueryViewTest(TestCase):
+    def setUp(self):
+        populate()
+        self.factory = RequestFactory()
+
+    def query(self, gridcls, **params):
+        params.setdefault('rows', '10')
+        return views.query(self.factory.get('/', params), gridcls.get_grid_id())
+
+    def test_timed_query(self):
+        use_debug_cursor = connection.use_debug_cursor
+        response = self.query(TimedGrid)
+        self.assertEqual(json.loads(response.content)['records'], 50)
+        self.assertIn('count;dur=', response['Server-Timing'])
+        self.assertEqual(connection.use_debug_cursor, use_debug_cursor)
+
+    def test_failed_query_restores_debug_cursor(self):
+        use_debug_cursor = connection.use_debug_cursor
+        self.assertRaises(RuntimeError, self.query, FailingGrid)
+        self.assertEqual(connection.use_debug_cursor, use_debug_cursor)
+
+class BatchViewTest(TestCase):
+    def setUp(self):
+        populate()
+        self.factory = RequestFactory()
+
+    def batch(self, *requests):
+        request = self.factory.get('/', {'requests': json.dumps(requests)})
+        return json.loads(views.batch(request).content)
+
+    def test_batch(self):
+        grid_id = TimedGrid.get_grid_id()
+        results = self.batch([grid_id, 'page=1&rows=10'], [grid_id, 'page=2&rows=20'])
+        self.assertEqual([(result['page'], len(result['rows'])) for result in results], [(1, 10), (2, 20)])
+
+    def test_streamed_grids_are_not_batched(self):
+        grid_id = TimedGrid.get_grid_id()
+        results = self.batch([grid_id, 'page=1&rows=10'], [grid_id, 'page=1&rows=5000'])
+        self.assertEqual(len(results[0]['rows']), 10)
+        self.assertIsNone(results[1])
+
+    def test_too_many_requests(self):
+        requests = [[TimedGrid.get_grid_id(), '']] * (views.MAX_BATCH_SIZE + 1)
+        request = self.factory.get('/', {'requests': json.dumps(requests)})
+        self.assertEqual(views.batch(request).status_code, 400)
+
+    def test_invalid_requests(self):
+        for requests in (None, 'x', '{}', '"ab"', '[1]', '[["a", "b", "c"]]'):
+            request = self.factory.get('/', {'requests': requests} if requests else {})
+            self.assertEqual(views.batch(request).status_code, 400)
+
+class CustomDataGrid(TimedGrid):
+    def get_json_data(self, querydict):
+        data = super(CustomDataGrid, self).get_json_data(querydict)
+        data['userdata'] = {'custom': True}
+        return data
+
+class StreamingTest(TestCase):
+    def setUp(self):
+        populate()
+        self.factory = RequestFactory()
+
+    def query(self, gridcls, **params):
+        return views.query(self.factory.get('/', params), gridcls.get_grid_id())
+
+    def test_large_pages_are_streamed(self):
+        response = self.query(TimedGrid, rows='5000')
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(json.loads(''.join(response.streaming_content))['rows']), 50)
+
+    def test_overridden_get_json_data_is_not_streamed(self):
+        response = self.query(CustomDataGrid, rows='5000')
+        self.assertFalse(response.streaming)
+        data = json.loads(response.content)
+        self.assertEqual(data['userdata'], {'custom': True})
+        self.assertEqual(len(data['rows']), 50)
+
+    def test_audited_grid_is_not_streamed(self):
+        from djqgrid.auditing import QueryAudit
+        grid = TimedGrid()
+        grid.query_audit = QueryAudit()
+        self.assertFalse(grid.is_streamed({'rows': '5000'}))
+        self.assertTrue(TimedGrid().is_streamed({'rows': '5000'}))
+
+class VersionedGrid(TimedGrid):
+    conditional = True
+    version_field = 'id'
+
+class CachedVersionGrid(TimedGrid):
+    conditional = True
+    response_cache = ResponseCache()
+
+class ConditionalTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        populate()
+        self.factory = RequestFactory()
+
+    def query(self, gridcls, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return views.query(self.factory.get('/', {'rows': '10'}, **headers), gridcls.get_grid_id())
+
+    def test_not_modified(self):
+        for gridcls, queries in ((VersionedGrid, 1), (CachedVersionGrid, 0)):
+            etag = self.query(gridcls)['ETag']
+            with self.assertNumQueries(queries):  # Only the version, no rows
+                response = self.query(gridcls, etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+
+    def test_changed_data_has_new_etag(self):
+        for gridcls in (VersionedGrid, CachedVersionGrid):
+            etag = self.query(gridcls)['ETag']
+            Order.objects.filter(pk=Order.objects.order_by('pk')[0].pk).delete()
+            response = self.query(gridcls, etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            self.assertEqual(self.query(gridcls, response['ETag']).status_code, 304)
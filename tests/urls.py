@@ -0,0 +1,4 @@
+from django.conf.urls import patterns, include, url
+import djqgrid.urls
+
+urlpatterns = patterns('', url(r'^grid/', include(djqgrid.urls)))